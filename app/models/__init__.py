@@ -1,10 +1,18 @@
-from .user import User, UserStats
+from .user import User, UserStats, UserCategoryStats
 from .user_progress import UserProgress
 from .story import Story, StoryNode
 from .choice import Choice
+from .node_hint import NodeHint
+from .choice_event import ChoiceEvent
+from .choice_counter import ChoiceCounter
+from .player_sketch import PlayerSketch
+from .story_popularity import StoryPopularity
+from .revoked_token import RevokedToken
+from .analytics import StoryFunnel, StoryNodeFunnel, StoryChoiceFunnel
 
 __all__ = [
-    'User', 'UserStats', 'UserProgress',
+    'User', 'UserStats', 'UserCategoryStats', 'UserProgress',
     'Story', 'StoryNode', 
-    'Choice'
+    'Choice', 'NodeHint', 'ChoiceEvent', 'ChoiceCounter', 'PlayerSketch',
+    'StoryPopularity', 'RevokedToken', 'StoryFunnel', 'StoryNodeFunnel', 'StoryChoiceFunnel'
 ]
\ No newline at end of file
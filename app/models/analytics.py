@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, BigInteger, Float, ForeignKey, DateTime
+from app.database import Base
+from sqlalchemy.sql import func
+
+
+class StoryFunnel(Base):
+    """Per-story totals of the last analytics rollup"""
+    __tablename__ = "story_funnels"
+
+    story_id = Column(Integer, ForeignKey('stories.story_id', ondelete='CASCADE'), primary_key=True)
+    events_processed = Column(BigInteger, nullable=False, default=0)
+    runs = Column(BigInteger, nullable=False, default=0)              # departures from the starting node
+    completed_runs = Column(BigInteger, nullable=False, default=0)    # arrivals at any ending
+    completion_rate = Column(Float, nullable=True)
+    median_path_length = Column(Float, nullable=True)                 # choices per completed run of a signed-in player
+    computed_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class StoryNodeFunnel(Base):
+    """Traffic through one node in the last rollup"""
+    __tablename__ = "story_node_funnels"
+
+    story_id = Column(Integer, ForeignKey('stories.story_id', ondelete='CASCADE'), primary_key=True)
+    node_id = Column(Integer, primary_key=True)
+    visits = Column(BigInteger, nullable=False, default=0)
+    departures = Column(BigInteger, nullable=False, default=0)        # choices taken from this node
+    drop_offs = Column(BigInteger, nullable=False, default=0)         # visits that went no further (non-endings only)
+    completion_rate = Column(Float, nullable=True)                    # endings only: arrivals / runs
+
+
+class StoryChoiceFunnel(Base):
+    """How often one choice was taken in the last rollup"""
+    __tablename__ = "story_choice_funnels"
+
+    story_id = Column(Integer, ForeignKey('stories.story_id', ondelete='CASCADE'), primary_key=True)
+    choice_id = Column(Integer, primary_key=True)
+    from_node_id = Column(Integer, nullable=False)
+    taken = Column(BigInteger, nullable=False, default=0)
+    share = Column(Float, nullable=True)                              # of all departures from from_node_id
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, BigInteger
+from app.database import Base
+
+
+class ChoiceCounter(Base):
+    """
+    How many times each choice has been taken, for "what other players chose".
+
+    Maintained by increments from every worker's in-memory counters (see
+    choice_stats_service); plain integer ids with no foreign keys so a
+    flush never fails on a choice deleted in the meantime.
+    """
+    __tablename__ = "choice_counters"
+
+    choice_id = Column(Integer, primary_key=True)
+    story_id = Column(Integer, nullable=False, index=True)
+    from_node_id = Column(Integer, nullable=False)
+    taken = Column(BigInteger, nullable=False, default=0)
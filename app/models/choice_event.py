@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime, Index
+from app.database import Base
+from sqlalchemy.sql import func
+
+
+class ChoiceEvent(Base):
+    """
+    Append-only log of choices taken, one row per click.
+
+    Range-partitioned by month on created_at (see choice_event_service), so
+    old history can be detached or dropped a month at a time. Rows carry
+    plain integer ids with no foreign keys to keep inserts cheap.
+    """
+    __tablename__ = "choice_events"
+
+    event_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())  # partition key
+    user_id = Column(Integer, nullable=True)  # NULL for anonymous play
+    story_id = Column(Integer, nullable=False)
+    from_node_id = Column(Integer, nullable=False)
+    choice_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('ix_choice_events_user_story', 'user_id', 'story_id', 'created_at'),
+        Index('ix_choice_events_story_user', 'story_id', 'user_id', 'created_at', 'event_id'),  # per-player replay for analytics
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON
+from app.database import Base
+from sqlalchemy.sql import func
+
+
+class NodeHint(Base):
+    """Materialized pathfinding index: one row per node of a published story"""
+    __tablename__ = "node_hints"
+
+    node_id = Column(Integer, ForeignKey('story_nodes.node_id', ondelete='CASCADE'), primary_key=True)
+    story_id = Column(Integer, ForeignKey('stories.story_id', ondelete='CASCADE'), nullable=False, index=True)
+    distance_to_ending = Column(Integer, nullable=True)      # choices to the nearest ending, NULL if none is reachable
+    nearest_ending_id = Column(Integer, nullable=True)
+    next_choice_id = Column(Integer, nullable=True)          # first choice on a shortest path to the nearest ending
+    endings = Column(JSON, nullable=False, default=dict)     # {ending_node_id: [distance, first_choice_id]}
+    built_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Date, LargeBinary
+from app.database import Base
+
+
+class PlayerSketch(Base):
+    """
+    HyperLogLog sketch of the distinct players seen at a story or node on one day.
+
+    node_id 0 holds the story-wide sketch, and day LIFETIME_DAY (see
+    sketch_service) the union over all days, so "ever" questions read one
+    row. `sketch` is HyperLogLog.to_bytes().
+    """
+    __tablename__ = "player_sketches"
+
+    story_id = Column(Integer, primary_key=True)
+    node_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    sketch = Column(LargeBinary, nullable=False)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+from sqlalchemy.sql import func
+
+
+class RevokedToken(Base):
+    """
+    Refresh token ids (jti) and token families (fid) that may no longer be used.
+
+    Rows are only needed until the tokens they block expire; every worker
+    mirrors the live ones in memory (see token_revocation).
+    """
+    __tablename__ = "revoked_tokens"
+
+    token_id = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, BigInteger, Float, ForeignKey, DateTime, Index
+from app.database import Base
+from sqlalchemy.sql import func
+
+
+class StoryPopularity(Base):
+    """
+    Play and completion counters behind /story/trending and /story/popular.
+
+    The scores are exponentially time-decayed and stored as logarithms
+    relative to a fixed landmark time (see popularity_service), so they only
+    ever grow by increments, never need a decay pass, and order stories the
+    same way their decayed values do at any moment.
+    """
+    __tablename__ = "story_popularity"
+
+    story_id = Column(Integer, ForeignKey('stories.story_id', ondelete='CASCADE'), primary_key=True)
+    plays = Column(BigInteger, nullable=False, default=0)
+    completions = Column(BigInteger, nullable=False, default=0)
+    trending_score = Column(Float, nullable=False)
+    popular_score = Column(Float, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_story_popularity_trending', 'trending_score', 'story_id'),
+        Index('ix_story_popularity_popular', 'popular_score', 'story_id'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String, DateTime,JSON,Boolean
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String, DateTime,JSON,Boolean,UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 from sqlalchemy.sql import func
@@ -10,6 +10,8 @@ class User(Base):
     username = Column(String(50), unique=True, index=True, nullable=False)
     email = Column(String(255), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)  # Match your schema
+    # Bumped by set_password only, not by rehashing the same password; refresh tokens carry it as `pwv`
+    password_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     last_active = Column(TIMESTAMP, server_default=func.now(), nullable=False)
     
@@ -17,6 +19,11 @@ class User(Base):
     stats = relationship("UserStats", back_populates="user", uselist=False)
     progress = relationship("UserProgress", back_populates="user")
 
+    def set_password(self, password_hash: str):
+        """Store a new password's hash; refresh tokens issued under the old password stop working"""
+        self.password_hash = password_hash
+        self.password_version = (self.password_version or 0) + 1
+
      
 class UserStats(Base):
     __tablename__ = "stats"
@@ -28,5 +35,19 @@ class UserStats(Base):
     favorite_category = Column(String(255), default="")
     total_play_time = Column(Integer, default=0) # in minutes
     user = relationship("User", back_populates="stats")
+
+    # One stats row per user; the stats aggregator upserts on this key
+    __table_args__ = (
+        UniqueConstraint('user_id', name='uq_stats_user'),
+    )
+
+
+class UserCategoryStats(Base):
+    """Completions per user and story category, the source of UserStats.favorite_category"""
+    __tablename__ = "user_category_stats"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    stories_completed = Column(Integer, default=0, nullable=False)
     
 
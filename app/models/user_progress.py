@@ -1,4 +1,4 @@
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String, DateTime,JSON,Boolean
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String, DateTime,JSON,Boolean,UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 from sqlalchemy.sql import func
@@ -11,10 +11,14 @@ class UserProgress(Base):
     user_id = Column(Integer,ForeignKey('users.user_id'))
     story_id = Column(Integer,ForeignKey("stories.story_id"))
     current_node_id = Column(Integer,ForeignKey('story_nodes.node_id'))
-    choice_node = Column(JSON,nullable=True)
     start_time =  Column(TIMESTAMP, server_default=func.now())
     last_updated = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
     is_completed = Column(Boolean,default=False)
 
     user = relationship("User", back_populates="progress")
     story = relationship("Story",back_populates="progress")
+
+    # One progress row per user and story; progress writes upsert on this key
+    __table_args__ = (
+        UniqueConstraint('user_id', 'story_id', name='uq_user_progress_user_story'),
+    )
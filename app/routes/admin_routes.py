@@ -1 +1,91 @@
- 
\ No newline at end of file
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database import get_async_db
+from app.models.story import Story
+from app.services.principal_cache import Principal
+from app.schemas.analytics_schemas import StoryFunnelResponse, NodeFunnel, ChoiceFunnel, FunnelRefreshResponse
+from app.services.analytics_service import funnel_rollups, get_story_funnel
+from app.services.auth_service import get_current_user
+from app.utils.password_utils import password_pool
+from config import settings
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+def _is_operator(current_user: Principal) -> bool:
+    return current_user.username in settings.OPERATOR_USERNAMES
+
+
+def get_operator(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """Dependency for operator-only endpoints: the caller's username must be in OPERATOR_USERNAMES"""
+    if not _is_operator(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operator access required")
+    return current_user
+
+
+async def _require_own_story(db: AsyncSession, story_id: int, current_user: Principal):
+    """
+    404 for a missing story, 403 unless the caller is its author or an operator.
+
+    Stories are not linked to user accounts; `Story.author` is the free-text
+    name given at creation, matched against the caller's username.
+    """
+    author = (await db.execute(select(Story.author).filter(Story.story_id == story_id))).scalar_one_or_none()
+    if author is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    if author != current_user.username and not _is_operator(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the story's author can view its analytics")
+
+
+@router.post(
+    "/analytics/stories/{story_id}/funnel",
+    response_model=FunnelRefreshResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def refresh_story_funnel(
+    story_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Recompute a story's funnel rollup from its choice history in the background"""
+    await _require_own_story(db, story_id, current_user)
+
+    if funnel_rollups.is_running(story_id):
+        return FunnelRefreshResponse(story_id=story_id, status="running")
+
+    background_tasks.add_task(funnel_rollups.run, story_id)
+    return FunnelRefreshResponse(story_id=story_id, status="scheduled")
+
+
+@router.get("/analytics/stories/{story_id}/funnel", response_model=StoryFunnelResponse)
+async def read_story_funnel(
+    story_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Visits, choice split, drop-offs and completion rates from the last rollup of a story"""
+    await _require_own_story(db, story_id, current_user)
+    rollup = await get_story_funnel(db, story_id)
+    if rollup is None:
+        raise HTTPException(status_code=404, detail="No funnel computed for this story yet")
+
+    funnel, nodes, choices = rollup
+    return StoryFunnelResponse(
+        story_id=funnel.story_id,
+        events_processed=funnel.events_processed,
+        runs=funnel.runs,
+        completed_runs=funnel.completed_runs,
+        completion_rate=funnel.completion_rate,
+        median_path_length=funnel.median_path_length,
+        computed_at=funnel.computed_at,
+        nodes=[NodeFunnel.model_validate(node) for node in nodes],
+        choices=[ChoiceFunnel.model_validate(choice) for choice in choices]
+    )
+
+
+@router.get("/metrics/password-pool")
+async def password_pool_metrics(current_user: Principal = Depends(get_operator)):
+    """Utilisation of the bcrypt process pool: running and queued jobs, rejections, average job time"""
+    return password_pool.metrics()
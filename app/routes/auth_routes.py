@@ -3,10 +3,15 @@ from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.database import get_db, get_async_db  # Import both sync and async
 from app.models.user import User
-from app.schemas.user_schemas import UserCreate, Userlogin, Token, TokenData, UserPublic, UserProfile
-from app.services.auth_service import authenticate_user, create_access_token, get_current_user, create_user, get_password_hash
+from app.schemas.user_schemas import UserCreate, Userlogin, Token, TokenData, UserPublic, UserProfile, RefreshRequest
+from app.services.auth_service import (
+    authenticate_user_async, create_token_pair, get_current_user,
+    get_password_hash_async, revoke_refresh_token, rotate_refresh_token
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from app.services.principal_cache import Principal
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")  # Fixed tokenUrl
@@ -27,7 +32,7 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_d
     db_user = User(
         username=user.username,  # Make sure this field exists in UserCreate
         email=user.email,
-        password_hash=get_password_hash(user.password)  # Properly hash the password
+        password_hash=await get_password_hash_async(user.password)  # Hashed in the password pool
     )
     
     db.add(db_user)
@@ -39,9 +44,9 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_d
 @router.post("/login", response_model=Token, summary="Log in to get access token")
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)  # Keep this as sync for now
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(
+    user = await authenticate_user_async(
         db,
         email=form_data.username,
         password=form_data.password
@@ -54,12 +59,24 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create a JWT token
-    access_token = create_access_token(
-        data={"user_id": user.user_id}
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Create a short-lived access token and a refresh token to renew it
+    return create_token_pair(user)
+
+@router.post("/refresh", response_model=Token, summary="Exchange a refresh token for a new token pair")
+async def refresh_access_token(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Renew a session without the password.
+
+    - The refresh token is single-use: the response carries its replacement.
+    - Reusing an already exchanged refresh token revokes the whole session.
+    - So does deleting the account or changing its password.
+    """
+    return await rotate_refresh_token(db, request.refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT, summary="Revoke a session's refresh tokens")
+async def logout(request: RefreshRequest):
+    """Revoke the refresh token and every token rotated from the same login"""
+    revoke_refresh_token(request.refresh_token)
 
 @router.get(
     "/me",
@@ -67,13 +84,20 @@ async def login_for_access_token(
     summary="Get current user's profile"
 )
 async def read_users_me(
-    current_user: User = Depends(get_current_user)  # Changed from UserPublic to User
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     A protected endpoint to fetch the current authenticated user's profile.
 
     - The `get_current_user` dependency handles all the token validation.
     - If the token is invalid or expired, the dependency will raise an HTTPException.
-    - If the token is valid, the user's data is returned.
+    - If the token is valid, the user's data is returned along with their stats.
     """
-    return current_user
\ No newline at end of file
+    result = await db.execute(
+        select(User).options(selectinload(User.stats)).filter(User.user_id == current_user.user_id)
+    )
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
\ No newline at end of file
@@ -8,7 +8,12 @@ from app.schemas.choice_schemas import (
     ChoiceCreate, ChoiceUpdate, ChoiceResponse
 )
 from app.services.auth_service import get_current_user
-from app.models.user import User
+from app.services.story_service import invalidate_story_graph
+from app.services.validation_state import validation_states
+from app.services.hint_service import hint_indexer
+from app.utils.cache import BlockingCache, get_blocking_cache, story_tag
+from app.utils.json_response import RawJSONResponse, dumps_model
+from app.services.principal_cache import Principal
 
 router = APIRouter(prefix="/choices", tags=["Choices"])
 
@@ -16,7 +21,8 @@ router = APIRouter(prefix="/choices", tags=["Choices"])
 def create_choice(
     choice_data:ChoiceCreate,
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Create a new choice between story nodes"""
     from_node = db.query(StoryNode).filter(StoryNode.node_id == choice_data.from_node_id).first()
@@ -69,14 +75,27 @@ def create_choice(
     db.add(db_choice)
     db.commit()
     db.refresh(db_choice)
+    invalidate_story_graph(from_node.story_id)
+    hint_indexer.mark_stale(from_node.story_id)
+    cache.invalidate_tags(story_tag(from_node.story_id))
+    validation_states.apply(
+        from_node.story_id, "choice_created",
+        db_choice.choice_id, db_choice.from_node_id, db_choice.to_node_id, db_choice.choice_letter
+    )
     
     return db_choice
 
 @router.get("/node/{node_id}", response_model=List[ChoiceResponse])
 def get_node_choices(
     node_id :int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
+    key = f"node_choices:{node_id}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
     node = db.query(StoryNode).filter(StoryNode.node_id == node_id).first()
     if not node:
         raise HTTPException(
@@ -86,29 +105,43 @@ def get_node_choices(
     
     choices = db.query(Choice).filter(Choice.from_node_id == node_id).order_by(Choice.choice_letter).all()
 
-    return choices
+    encoded = dumps_model(List[ChoiceResponse], choices)
+    cache.set(key, encoded, tags=[story_tag(node.story_id)])
+    return RawJSONResponse(encoded)
 
 @router.get("/{choice_id}", response_model=ChoiceResponse)
 def get_choice(
     choice_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Get a specific choice by ID"""
-    choice = db.query(Choice).filter(Choice.choice_id == choice_id).first()
-    if not choice:
+    key = f"choice:{choice_id}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
+    row = db.query(Choice, StoryNode.story_id).join(
+        StoryNode, Choice.from_node_id == StoryNode.node_id
+    ).filter(Choice.choice_id == choice_id).first()
+    if not row:
         raise HTTPException(
             status_code=404,
             detail="Choice not found"
         )
     
-    return choice
+    choice, story_id = row
+    encoded = dumps_model(ChoiceResponse, choice)
+    cache.set(key, encoded, tags=[story_tag(story_id)])
+    return RawJSONResponse(encoded)
 
 @router.put("/{choice_id}", response_model=ChoiceResponse)
 def update_choice(
     choice_id: int,
     choice_data: ChoiceUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Update an existing choice"""
     choice = db.query(Choice).filter(Choice.choice_id == choice_id).first()
@@ -163,6 +196,13 @@ def update_choice(
     try:
         db.commit()
         db.refresh(choice)
+        invalidate_story_graph(choice.from_node.story_id)
+        hint_indexer.mark_stale(choice.from_node.story_id)
+        cache.invalidate_tags(story_tag(choice.from_node.story_id))
+        validation_states.apply(
+            choice.from_node.story_id, "choice_updated",
+            choice.choice_id, choice.to_node_id, choice.choice_letter
+        )
         return choice
     except Exception as e:
         db.rollback()
@@ -175,7 +215,8 @@ def update_choice(
 def delete_choice(
     choice_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Delete a choice"""
     choice = db.query(Choice).filter(Choice.choice_id == choice_id).first()
@@ -185,9 +226,14 @@ def delete_choice(
             detail="Choice not found"
         )
     
+    story_id = choice.from_node.story_id
     try:
         db.delete(choice)
         db.commit()
+        invalidate_story_graph(story_id)
+        hint_indexer.mark_stale(story_id)
+        cache.invalidate_tags(story_tag(story_id))
+        validation_states.apply(story_id, "choice_deleted", choice_id)
         return {"message": f"Choice '{choice.choice_text}' deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -199,11 +245,19 @@ def delete_choice(
 @router.get("/story/{story_id}/all", response_model=List[ChoiceResponse])
 def get_all_story_choices(
     story_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Get all choices for a specific story"""
+    key = f"story_choices:{story_id}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
     choices = db.query(Choice).join(StoryNode, Choice.from_node_id == StoryNode.node_id).filter(
         StoryNode.story_id == story_id
     ).order_by(Choice.from_node_id, Choice.choice_letter).all()
     
-    return choices
\ No newline at end of file
+    encoded = dumps_model(List[ChoiceResponse], choices)
+    cache.set(key, encoded, tags=[story_tag(story_id)])
+    return RawJSONResponse(encoded)
@@ -1,52 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from app.database import get_db
-from app.services.game_engine_service import GameEngine
+from app.database import get_async_db
+from app.services.game_engine_service import AsyncGameEngine
 from app.schemas.engine_schemas import (
-    NodeResponse, ChoiceRequest, ChoiceResponse, ValidationResult
+    NodeResponse, GameStartResponse, ChoiceRequest, ChoiceResponse, ChoiceBatchRequest, ChoiceBatchResponse,
+    LookaheadResponse, HintResponse, ValidationResult, InProgressPage, UniquePlayersResponse
 )
-from app.services.auth_service import get_current_user
-from app.models.user import User
+from app.services.auth_service import get_current_user, get_current_user_optional
+from app.services.principal_cache import Principal, TokenPrincipal
+from app.utils.json_response import RawJSONResponse
+from app.utils.cache import CacheBackend, get_cache
+from config import settings
 
 router = APIRouter(prefix="/game", tags=["Game Engine"])
 
-@router.post("/start/{story_id}", response_model=NodeResponse)
-def start_storys(
+async def get_game_engine(
+    db: AsyncSession = Depends(get_async_db),
+    cache: CacheBackend = Depends(get_cache)
+) -> AsyncGameEngine:
+    return AsyncGameEngine(db, cache=cache)
+
+@router.post("/start/{story_id}", response_model=GameStartResponse)
+async def start_storys(
     story_id:int,
-    db:Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user)):
+    stateless: bool = Query(False, description="Return a signed state_token to carry through /game/choice instead of server-side progress"),
+    choice_stats: bool = Query(False, description="Include what fraction of players picked each choice"),
+    engine: AsyncGameEngine = Depends(get_game_engine),
+    current_user: Optional[TokenPrincipal] = Depends(get_current_user_optional)):
     """Start a new story session"""
-    engine = GameEngine(db)
     user_id = current_user.user_id if current_user else None
 
-    return engine.start_story(story_id,user_id)
+    return RawJSONResponse(await engine.start_story(story_id,user_id,stateless,choice_stats))
 
 @router.post("/choice", response_model=ChoiceResponse)
-def make_choice(
+async def make_choice(
     choice_request : ChoiceRequest,
-    db: Session = Depends(get_db),
-    current_user : Optional[User] = Depends(get_current_user)
+    choice_stats: bool = Query(False, description="Include what fraction of players picked each choice"),
+    engine: AsyncGameEngine = Depends(get_game_engine),
+    current_user : Optional[TokenPrincipal] = Depends(get_current_user_optional)
 ):
     """Make choice to get a next node"""
-    engine = GameEngine(db)
-    # If user is authenticated, use their ID; otherwise use the one from request
-    if current_user:
-        choice_request.user_id = current_user.user_id
+    user_id = current_user.user_id if current_user else None
+
+    return RawJSONResponse(await engine.make_choice(choice_request, user_id, choice_stats))
+
+@router.post("/choices/batch", response_model=ChoiceBatchResponse)
+async def make_choices(
+    batch: ChoiceBatchRequest,
+    engine: AsyncGameEngine = Depends(get_game_engine),
+    current_user : Optional[TokenPrincipal] = Depends(get_current_user_optional)
+):
+    """Submit an ordered list of choices (offline queue or path replay) in one request"""
+    user_id = current_user.user_id if current_user else None
 
-    return engine.make_choice(choice_request) 
+    return RawJSONResponse(await engine.make_choices(batch, user_id))
+
+@router.post("/heartbeat/{story_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def heartbeat(
+    story_id: int,
+    engine: AsyncGameEngine = Depends(get_game_engine),
+    current_user : Principal = Depends(get_current_user)
+):
+    """Tell the server the player is still in the story, every few seconds while it is on screen"""
+    await engine.heartbeat(story_id, current_user.user_id)
+
+@router.get("/current", response_model=InProgressPage)
+async def get_in_progress(
+    limit: int = Query(settings.IN_PROGRESS_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    engine: AsyncGameEngine = Depends(get_game_engine),
+    current_user : Principal = Depends(get_current_user)
+):
+    """Every story the user has started but not finished, with its current node, most recently played first"""
+    return RawJSONResponse(await engine.get_in_progress(current_user.user_id, limit, cursor))
 
 @router.get("/current/{story_id}", response_model=NodeResponse)
-def get_current_node(
+async def get_current_node(
     story_id :int,
-    db:Session = Depends(get_db),
-    current_user : User = Depends(get_current_user)
+    choice_stats: bool = Query(False, description="Include what fraction of players picked each choice"),
+    engine: AsyncGameEngine = Depends(get_game_engine),
+    current_user : Principal = Depends(get_current_user)
 ):
     """Get the current node for authenticated user's story progress"""
-    engine = GameEngine(db)
-    return engine.get_current_node(story_id,current_user.user_id)
+    return RawJSONResponse(await engine.get_current_node(story_id,current_user.user_id,choice_stats))
 
+@router.get("/node/{node_id}/lookahead", response_model=LookaheadResponse)
+async def lookahead(
+    node_id: int,
+    depth: int = Query(1, ge=0, le=settings.LOOKAHEAD_MAX_DEPTH, description="How many choices ahead to include"),
+    engine: AsyncGameEngine = Depends(get_game_engine)
+):
+    """Get a node together with the nodes its choices lead to, so clients can prefetch"""
+    return RawJSONResponse(await engine.lookahead(node_id, depth))
 
+@router.get("/node/{node_id}/hint", response_model=HintResponse)
+async def get_hint(
+    node_id: int,
+    engine: AsyncGameEngine = Depends(get_game_engine)
+):
+    """How far a node is from an ending, and which choice reaches each ending fastest"""
+    return RawJSONResponse(await engine.get_hint(node_id))
 
+@router.get("/story/{story_id}/players", response_model=UniquePlayersResponse)
+async def story_players(
+    story_id: int,
+    days: Optional[int] = Query(None, ge=1, le=settings.PLAYER_SKETCH_MAX_DAYS, description="Count players of the last N days (today included) instead of all time"),
+    engine: AsyncGameEngine = Depends(get_game_engine)
+):
+    """Approximately how many signed-in players have played a story"""
+    return RawJSONResponse(await engine.unique_players(story_id, days=days))
 
+@router.get("/node/{node_id}/players", response_model=UniquePlayersResponse)
+async def node_players(
+    node_id: int,
+    days: Optional[int] = Query(None, ge=1, le=settings.PLAYER_SKETCH_MAX_DAYS, description="Count players of the last N days (today included) instead of all time"),
+    engine: AsyncGameEngine = Depends(get_game_engine)
+):
+    """Approximately how many signed-in players have reached a node, e.g. an ending"""
+    return RawJSONResponse(await engine.unique_players(None, node_id=node_id, days=days))
 
+@router.get("/validate/{story_id}", response_model=ValidationResult)
+async def validate_story(
+    story_id: int,
+    engine: AsyncGameEngine = Depends(get_game_engine)
+):
+    """Validate a story's structure (reachability, dead ends, letter conflicts)"""
+    return RawJSONResponse(await engine.validate_story(story_id))
@@ -3,12 +3,19 @@
 from fastapi import APIRouter,Depends,HTTPException,status,Query
 from app.database import get_db,get_async_db
 from app.models.story import Story,StoryNode
-from app.schemas.story_schemas import StoryBase,StoryCreate,StoryListResponse,StoryResponse,StoryUpdate,CategoriesListResponse
+from app.schemas.story_schemas import StoryBase,StoryCreate,StoryListResponse,StoryResponse,StoryUpdate,CategoriesListResponse,RankedStoriesPage
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy import func, distinct
 from typing import List,Optional
+from app.services.story_service import invalidate_story_graph
+from app.services.validation_state import validation_states
+from app.services.hint_service import hint_indexer
+from app.services.popularity_service import RANKINGS, decayed_score, ranked_stories
+from app.utils.cache import BlockingCache, get_blocking_cache, story_tag, STORY_LIST_TAG
+from app.utils.json_response import RawJSONResponse, dumps_model
+from config import settings
 
 
 router = APIRouter(prefix="/story", tags=["Stories"])
@@ -17,7 +24,8 @@ router = APIRouter(prefix="/story", tags=["Stories"])
 @router.post('/stories', response_model=StoryResponse, status_code=status.HTTP_201_CREATED)
 def create_story(
     story_data: StoryCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     story_title = db.query(Story).filter(Story.title == story_data.title).all()
 
@@ -37,33 +45,100 @@ def create_story(
     db.add(db_add)
     db.commit()
     db.refresh(db_add)
+    cache.invalidate_tags(STORY_LIST_TAG)
+    if db_add.is_published:
+        hint_indexer.mark_stale(db_add.story_id)
 
     return db_add
 
 # get story
 @router.get('/get_story', response_model = List[StoryResponse])
-def get_story(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_story(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), cache: BlockingCache = Depends(get_blocking_cache)):
+    key = f"stories:{skip}:{limit}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
     try:
         categorys = db.query(Story).offset(skip).limit(limit).all()
-        return categorys
+        encoded = dumps_model(List[StoryResponse], categorys)
+        cache.set(key, encoded, tags=[STORY_LIST_TAG])
+        return RawJSONResponse(encoded)
     except:
         raise HTTPException(status = status.HTTP_401_UNAUTHORIZED,
                             detail="U hve not uthrization")
     
+def _ranking_page(ranking: str, limit: int, cursor: Optional[str], db: Session, cache: BlockingCache):
+    key = f"ranking:{ranking}:{limit}:{cursor}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
+    try:
+        rows, next_cursor = ranked_stories(db, ranking, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    _, half_life = RANKINGS[ranking]
+    now = datetime.now(timezone.utc)
+    stories = [
+        {
+            **StoryResponse.model_validate(story).model_dump(),
+            "score": decayed_score(getattr(popularity, f"{ranking}_score"), half_life, now),
+            "plays": popularity.plays,
+            "completions": popularity.completions
+        }
+        for story, popularity in rows
+    ]
+    encoded = dumps_model(RankedStoriesPage, {"stories": stories, "next_cursor": next_cursor})
+    # Scores move with every play; a short TTL bounds how stale a page gets
+    cache.set(key, encoded, ttl=settings.RANKING_CACHE_TTL, tags=[STORY_LIST_TAG])
+    return RawJSONResponse(encoded)
+
+
+@router.get('/trending', response_model=RankedStoriesPage)
+def get_trending_stories(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
+):
+    """Published stories with the most plays and completions lately (half-life of TRENDING_HALF_LIFE_HOURS)"""
+    return _ranking_page("trending", limit, cursor, db, cache)
+
+
+@router.get('/popular', response_model=RankedStoriesPage)
+def get_popular_stories(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
+):
+    """Published stories with the most plays and completions over the long run (half-life of POPULAR_HALF_LIFE_DAYS)"""
+    return _ranking_page("popular", limit, cursor, db, cache)
+
+
 @router.get('/get_story/{story_id}', response_model = StoryResponse)
-def get_story_id(story_id,db:Session = Depends(get_db)):
+def get_story_id(story_id,db:Session = Depends(get_db),cache: BlockingCache = Depends(get_blocking_cache)):
+    key = f"story:{story_id}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
     story_getid = db.query(Story).filter(Story.story_id == story_id).first()
 
     if not story_getid:
         raise HTTPException(status_code = status.HTTP_404_NOT_FOUND,detail="ID not found pls write the correct id")
     
-    return story_getid
+    encoded = dumps_model(StoryResponse, story_getid)
+    cache.set(key, encoded, tags=[story_tag(story_getid.story_id)])
+    return RawJSONResponse(encoded)
 
 @router.put('/stories/{story_id}', response_model=StoryResponse)
 def update_story(
     story_id: int,
     story_data: StoryUpdate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Update existing story"""
     story = db.query(Story).filter(Story.story_id == story_id).first()
@@ -82,6 +157,9 @@ def update_story(
     try:
         db.commit()
         db.refresh(story)
+        invalidate_story_graph(story.story_id)
+        hint_indexer.mark_stale(story.story_id)
+        cache.invalidate_tags(story_tag(story.story_id), STORY_LIST_TAG)
         return story
     except Exception as e:
         db.rollback()
@@ -91,11 +169,14 @@ def update_story(
         )
 
 @router.delete('/stories/{story_id}', response_model=StoryResponse)
-def detele_storyid(story_id,db:Session= Depends(get_db)):
+def detele_storyid(story_id,db:Session= Depends(get_db),cache: BlockingCache = Depends(get_blocking_cache)):
     find_story = db.query(Story).filter(Story.story_id == story_id).first()
 
     db.delete(find_story)
     db.commit()
+    invalidate_story_graph(find_story.story_id)
+    validation_states.discard(find_story.story_id)
+    cache.invalidate_tags(story_tag(find_story.story_id), STORY_LIST_TAG)
 
     return JSONResponse(
         status_code=200,
@@ -105,12 +186,17 @@ def detele_storyid(story_id,db:Session= Depends(get_db)):
 @router.get('/stories/categories', response_model=CategoriesListResponse)
 def get_story_categories(
     db: Session = Depends(get_db),
-    published_only: bool = Query(True, description="Only include categories from published stories")
+    published_only: bool = Query(True, description="Only include categories from published stories"),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """
     Get all unique story categories
     Simple list of category names
     """
+    key = f"categories:{published_only}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
     try:
         query = db.query(distinct(Story.category)).filter(Story.category.isnot(None))
         
@@ -122,10 +208,12 @@ def get_story_categories(
         # Extract category names from tuples
         category_names = [cat[0] for cat in categories if cat[0]]
         
-        return CategoriesListResponse(
+        encoded = CategoriesListResponse(
             categories=sorted(category_names),
             total_count=len(category_names)
-        )
+        ).model_dump_json().encode("utf-8")
+        cache.set(key, encoded, tags=[STORY_LIST_TAG])
+        return RawJSONResponse(encoded)
         
     except Exception as e:
         raise HTTPException(
@@ -8,6 +8,12 @@ from app.schemas.story_nodes_shcemas import (
     StoryNodeCreate, StoryNodeUpdate, StoryNodeResponse
 )
 from app.services.auth_service import get_current_user
+from app.services.story_service import invalidate_story_graph
+from app.services.validation_state import validation_states
+from app.services.hint_service import hint_indexer
+from app.schemas.engine_schemas import ValidationResult
+from app.utils.cache import BlockingCache, get_blocking_cache, story_tag
+from app.utils.json_response import RawJSONResponse, dumps_model
 from app.models.user import User
 
 router = APIRouter(prefix="/story_nodes",tags=["Story Nodes"])
@@ -16,7 +22,8 @@ router = APIRouter(prefix="/story_nodes",tags=["Story Nodes"])
 def create_story_node(
     node_data : StoryNodeCreate,
     db: Session = Depends(get_db),
-    current_user = get_current_user
+    current_user = get_current_user,
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     story = db.query(Story).filter(Story.story_id == node_data.story_id).first()
 
@@ -46,28 +53,44 @@ def create_story_node(
     db.add(db_node)
     db.commit()
     db.refresh(db_node)
+    invalidate_story_graph(db_node.story_id)
+    hint_indexer.mark_stale(db_node.story_id)
+    cache.invalidate_tags(story_tag(db_node.story_id))
+    validation_states.apply(
+        db_node.story_id, "node_created",
+        db_node.node_id, db_node.is_starting_node, db_node.is_ending_node
+    )
     
     return db_node
 
 
 @router.get("/story/{story_id}", response_model=List[StoryNodeResponse])
 def get_story_nodes(
-    story_id:int,skip:int = 0, limit:int = 100,db: Session = Depends(get_db)
+    story_id:int,skip:int = 0, limit:int = 100,db: Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
+    key = f"story_nodes:{story_id}:{skip}:{limit}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
     story = db.query(Story).filter(Story.story_id == story_id).first()
     if not story:
         raise HTTPException (status_code=404,detail="Stroy Not found")
     
     nodes = db.query(StoryNode).filter(StoryNode.story_id == story_id).offset(skip).limit(limit).all()
 
-    return nodes
+    encoded = dumps_model(List[StoryNodeResponse], nodes)
+    cache.set(key, encoded, tags=[story_tag(story_id)])
+    return RawJSONResponse(encoded)
 
 @router.get("/{node_id}", response_model=StoryNodeResponse)
 def get_story_node(
     node_id : int,
     node_data : StoryNodeUpdate,
     db : Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Update an existing story node"""
     node = db.query(StoryNode).filter(StoryNode.node_id == node_id).first()
@@ -98,6 +121,13 @@ def get_story_node(
     try:
         db.commit()
         db.refresh(node)
+        invalidate_story_graph(node.story_id)
+        hint_indexer.mark_stale(node.story_id)
+        cache.invalidate_tags(story_tag(node.story_id))
+        validation_states.apply(
+            node.story_id, "node_updated",
+            node.node_id, node.is_starting_node, node.is_ending_node
+        )
         return node
     except Exception as e:
         db.rollback()
@@ -108,7 +138,8 @@ def get_story_node(
     
 @router.delete("{node_id}")
 def delete_story_node(
-    node_id:int,db:Session = Depends(get_db),current_user = Depends(get_current_user)
+    node_id:int,db:Session = Depends(get_db),current_user = Depends(get_current_user),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     node = db.query(StoryNode).filter(StoryNode.node_id == node_id).first()
     if not node:
@@ -130,6 +161,10 @@ def delete_story_node(
     try:
         db.delete(node)
         db.commit()
+        invalidate_story_graph(node.story_id)
+        hint_indexer.mark_stale(node.story_id)
+        cache.invalidate_tags(story_tag(node.story_id))
+        validation_states.apply(node.story_id, "node_deleted", node_id)
         return {"message": f"Story node '{node.node_title}' deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -141,9 +176,15 @@ def delete_story_node(
 @router.get("/story/{story_id}/starting-node", response_model=StoryNodeResponse)
 def get_starting_node(
     story_id :int,
-    db : Session = Depends(get_db)
+    db : Session = Depends(get_db),
+    cache: BlockingCache = Depends(get_blocking_cache)
 ):
     """Get the starting node for a story"""
+    key = f"starting_node:{story_id}"
+    cached = cache.get(key)
+    if cached is not None:
+        return RawJSONResponse(cached)
+
     starting_node = db.query(StoryNode).filter(
         StoryNode.story_id == story_id,
         StoryNode.is_starting_node == True
@@ -155,4 +196,18 @@ def get_starting_node(
             detail="Starting node not found for this story"
         )
     
-    return starting_node
+    encoded = dumps_model(StoryNodeResponse, starting_node)
+    cache.set(key, encoded, tags=[story_tag(story_id)])
+    return RawJSONResponse(encoded)
+
+@router.get("/story/{story_id}/validation", response_model=ValidationResult)
+def get_story_validation(
+    story_id: int,
+    db: Session = Depends(get_db)
+):
+    """Current validity of a story, kept up to date as nodes and choices are edited"""
+    story = db.query(Story.story_id).filter(Story.story_id == story_id).first()
+    if not story:
+        raise HTTPException(status_code=404, detail="Story not found")
+
+    return validation_states.result(db, story_id)
@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+
+
+class NodeFunnel(BaseModel):
+    node_id: int
+    visits: int
+    departures: int
+    drop_offs: int
+    completion_rate: Optional[float] = None  # endings only
+
+    class Config:
+        from_attributes = True
+
+class ChoiceFunnel(BaseModel):
+    choice_id: int
+    from_node_id: int
+    taken: int
+    share: Optional[float] = None  # of all choices taken from from_node_id
+
+    class Config:
+        from_attributes = True
+
+class StoryFunnelResponse(BaseModel):
+    story_id: int
+    events_processed: int
+    runs: int
+    completed_runs: int
+    completion_rate: Optional[float] = None
+    median_path_length: Optional[float] = None
+    computed_at: datetime
+    nodes: List[NodeFunnel] = []
+    choices: List[ChoiceFunnel] = []
+
+class FunnelRefreshResponse(BaseModel):
+    story_id: int
+    status: str  # "scheduled" or "running"
@@ -4,6 +4,11 @@ from datetime import datetime
 from enum import Enum
 
 
+class ChoiceStat(BaseModel):
+    choice_id: int
+    times_chosen: int
+    percentage: float  # of all choices taken at this node
+
 class NodeResponse(BaseModel):
     node_id : int
     node_title : str
@@ -12,20 +17,74 @@ class NodeResponse(BaseModel):
     is_ending_node : bool
     node_type: str
     choices:List[Dict[str,Any]] = []
+    choice_stats: Optional[List[ChoiceStat]] = None  # only when requested with choice_stats=true
+
+class GameStartResponse(NodeResponse):
+    state_token: Optional[str] = None  # only in stateless mode
 
 class ChoiceRequest(BaseModel):
     current_node_id: int
     choice_id: int
-    user_id: Optional[int] = None
+    state_token: Optional[str] = None  # stateless mode: the token from the previous response
 
 
 
+class ChoiceStep(BaseModel):
+    current_node_id: int
+    choice_id: int
+
+class ChoiceBatchRequest(BaseModel):
+    story_id: int
+    steps: List[ChoiceStep] = Field(..., min_length=1, max_length=1000)  # in play order
+
+class ChoiceBatchResponse(BaseModel):
+    success: bool
+    steps_applied: int
+    next_node: NodeResponse
+    is_ending: bool
+    progress_saved: bool
+
 class ChoiceResponse(BaseModel):
     success: bool
     next_node: NodeResponse
     consequences: Optional[str] = None
     is_ending: bool
     progress_saved: bool
+    state_token: Optional[str] = None  # only in stateless mode
+
+class InProgressStory(BaseModel):
+    story_id: int
+    story_title: str
+    last_updated: datetime
+    current_node: NodeResponse
+
+class InProgressPage(BaseModel):
+    stories: List[InProgressStory] = []  # most recently played first
+    next_cursor: Optional[str] = None  # pass as `cursor` to get the next page
+
+class LookaheadResponse(BaseModel):
+    node_id: int
+    depth: int
+    nodes: List[NodeResponse] = []  # requested node first, then successors breadth-first, each once
+
+class EndingHint(BaseModel):
+    ending_node_id: int
+    distance: int
+    choice_id: Optional[int] = None  # first choice on a shortest path; None when already there
+
+class HintResponse(BaseModel):
+    node_id: int
+    distance_to_ending: Optional[int] = None  # None when no ending is reachable
+    nearest_ending_id: Optional[int] = None
+    next_choice_id: Optional[int] = None
+    endings: List[EndingHint] = []  # nearest first
+
+class UniquePlayersResponse(BaseModel):
+    story_id: int
+    node_id: Optional[int] = None  # None for the whole story
+    days: Optional[int] = None  # window ending today; None for all time
+    unique_players: int  # estimate
+    relative_error: float  # standard error of the estimate, e.g. 0.016 for 1.6%
 
 class ValidationResult(BaseModel):
     is_valid: bool
@@ -33,5 +92,8 @@ class ValidationResult(BaseModel):
     total_nodes: int
     total_choices: int
     unreachable_nodes: List[int] = []
-    dead_ends: List[int] = []   
+    dead_ends: List[int] = []
+    cannot_reach_ending: List[int] = []
+    cycles_without_exit: List[List[int]] = []
+    letter_conflicts: List[int] = []  # node ids with duplicate choice letters
 
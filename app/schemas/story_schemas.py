@@ -36,6 +36,15 @@ class StoryResponse(StoryBase):
     class Config:
         from_attributes = True
 
+class RankedStoryResponse(StoryResponse):
+    score: float  # weighted plays and completions, decayed to now
+    plays: int
+    completions: int
+
+class RankedStoriesPage(BaseModel):
+    stories: List[RankedStoryResponse] = []  # highest score first
+    next_cursor: Optional[str] = None  # pass as `cursor` to get the next page
+
 class StoryListResponse(BaseModel):
     story_id: int
     title: str
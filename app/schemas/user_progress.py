@@ -6,7 +6,6 @@ from enum import Enum
 
 
 class UserProgressBase(BaseModel):
-    choice_node: Optional[Dict[str, Any]] = None
     is_completed: bool = False
 
 class UserProgressCreate(UserProgressBase):
@@ -16,7 +15,6 @@ class UserProgressCreate(UserProgressBase):
 
 class UserProgressUpdate(BaseModel):
     current_node_id: Optional[int] = None
-    choice_node: Optional[Dict[str, Any]] = None
     is_completed: Optional[bool] = None
 
 class UserProgressResponse(UserProgressBase):
@@ -53,6 +53,10 @@ class UserUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     refresh_token:  Optional[str] = None 
+    token_type: str = "bearer"
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
     
 class TokenData(BaseModel):
     id: Optional[int] = None
@@ -1 +1,270 @@
- 
\ No newline at end of file
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Set
+
+import numpy as np
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql import func
+from starlette.concurrency import run_in_threadpool
+
+from app.database import AsyncSessionLocal
+from app.models.analytics import StoryFunnel, StoryNodeFunnel, StoryChoiceFunnel
+from app.models.choice_event import ChoiceEvent
+from app.models.story import Story
+from app.services.validation_service import NodeRow, ChoiceRow, load_story_structure_async
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT when a story's rollup is rewritten
+ROLLUP_INSERT_BATCH = 5000
+
+
+@dataclass
+class FunnelTotals:
+    events_processed: int
+    runs: int
+    completed_runs: int
+    completion_rate: Optional[float]
+    median_path_length: Optional[float]
+
+
+class FunnelAccumulator:
+    """
+    Streaming funnel aggregation for one story.
+
+    Feed it choice_events in chunks of (user_id, choice_id) int64 arrays,
+    ordered by user then time, with -1 for anonymous players. Each chunk
+    costs a few vectorized passes and the state kept between chunks is
+    O(nodes + choices + longest path), however many events there are.
+
+    Every departure from the starting node counts as a run. Visits and
+    drop-offs follow from flow through the graph, so anonymous events count
+    too; path lengths need a player to follow and only use signed-in runs
+    that reached an ending. Events for choices that have since been
+    deleted cannot be placed in the current graph and are skipped.
+    """
+
+    def __init__(self, nodes: Sequence[NodeRow], choices: Sequence[ChoiceRow]):
+        self.node_ids = np.array(sorted(row[0] for row in nodes), dtype=np.int64)
+        ending_ids = np.array([row[0] for row in nodes if row[2]], dtype=np.int64)
+        start_ids = [row[0] for row in nodes if row[1]]
+        self.is_ending = np.isin(self.node_ids, ending_ids)
+        self.start_index = int(self._node_index(np.array(start_ids[:1], dtype=np.int64))[0]) if start_ids else -1
+
+        ordered = sorted(choices)
+        self.choice_ids = np.array([row[0] for row in ordered], dtype=np.int64)
+        self.choice_from = self._node_index(np.array([row[1] for row in ordered], dtype=np.int64))
+        self.choice_to = self._node_index(np.array([row[2] for row in ordered], dtype=np.int64))  # -1 outside the story
+
+        self.events = 0
+        self.taken = np.zeros(len(self.choice_ids), dtype=np.int64)
+        self.path_lengths = np.zeros(1, dtype=np.int64)   # histogram of completed run lengths
+
+        # The run still open at the end of the previous chunk
+        self._run_user = -1
+        self._run_length = 0
+        self._run_last_to = -1
+
+    def _node_index(self, node_ids: np.ndarray) -> np.ndarray:
+        return self._lookup(self.node_ids, node_ids)
+
+    @staticmethod
+    def _lookup(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Dense index of each id in `sorted_ids`, -1 when absent"""
+        if not len(sorted_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        index = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        return np.where(sorted_ids[index] == ids, index, -1)
+
+    def add_chunk(self, users: np.ndarray, choice_ids: np.ndarray):
+        self.events += len(users)
+        choice_index = self._lookup(self.choice_ids, choice_ids)
+        known = choice_index >= 0
+        users, choice_index = users[known], choice_index[known]
+
+        self.taken += np.bincount(choice_index, minlength=len(self.choice_ids))
+        signed_in = users >= 0
+        self._add_runs(users[signed_in], choice_index[signed_in])
+
+    def _add_runs(self, users: np.ndarray, choice_index: np.ndarray):
+        if not len(users):
+            return
+        from_index = self.choice_from[choice_index]
+        to_index = self.choice_to[choice_index]
+
+        starts_run = np.empty(len(users), dtype=bool)
+        starts_run[0] = users[0] != self._run_user
+        starts_run[1:] = users[1:] != users[:-1]
+        starts_run |= from_index == self.start_index
+
+        # Run 0 is the run carried over from the previous chunk, possibly with more events here
+        run_ids = np.cumsum(starts_run)
+        lengths = np.bincount(run_ids)
+        lengths[0] += self._run_length
+        ended_at = np.full(len(lengths), -1, dtype=np.int64)
+        ended_at[0] = self._run_last_to
+        last_of_run = np.flatnonzero(np.append(starts_run[1:], True))
+        ended_at[run_ids[last_of_run]] = to_index[last_of_run]
+
+        # The last run may continue in the next chunk
+        self._close_runs(lengths[:-1], ended_at[:-1])
+        self._run_user = int(users[-1])
+        self._run_length = int(lengths[-1])
+        self._run_last_to = int(ended_at[-1])
+
+    def _close_runs(self, lengths: np.ndarray, ended_at: np.ndarray):
+        completed = (lengths > 0) & (ended_at >= 0)
+        completed[completed] = self.is_ending[ended_at[completed]]
+        if not completed.any():
+            return
+        counts = np.bincount(lengths[completed])
+        if len(counts) > len(self.path_lengths):
+            self.path_lengths = np.pad(self.path_lengths, (0, len(counts) - len(self.path_lengths)))
+        self.path_lengths[:len(counts)] += counts
+
+    def finish(self):
+        """Close the open run and derive node figures; returns (totals, node rows, choice rows)"""
+        self._close_runs(np.array([self._run_length]), np.array([self._run_last_to]))
+        self._run_user, self._run_length, self._run_last_to = -1, 0, -1
+
+        node_count = len(self.node_ids)
+        departures = np.bincount(self.choice_from, weights=self.taken, minlength=node_count).astype(np.int64)
+        inside = self.choice_to >= 0
+        arrivals = np.bincount(
+            self.choice_to[inside], weights=self.taken[inside], minlength=node_count
+        ).astype(np.int64)
+
+        runs = int(departures[self.start_index]) if self.start_index >= 0 else 0
+        visits = arrivals.copy()
+        if self.start_index >= 0:
+            visits[self.start_index] = max(runs, int(arrivals[self.start_index]))
+        drop_offs = np.where(self.is_ending, 0, np.maximum(visits - departures, 0))
+        completed_runs = int(arrivals[self.is_ending].sum())
+
+        totals = FunnelTotals(
+            events_processed=self.events,
+            runs=runs,
+            completed_runs=completed_runs,
+            completion_rate=completed_runs / runs if runs else None,
+            median_path_length=self._median_path_length()
+        )
+        node_rows = [
+            {
+                "node_id": int(node_id),
+                "visits": int(visits[i]),
+                "departures": int(departures[i]),
+                "drop_offs": int(drop_offs[i]),
+                "completion_rate": (int(arrivals[i]) / runs if runs else None) if self.is_ending[i] else None
+            }
+            for i, node_id in enumerate(self.node_ids)
+        ]
+        choice_rows = [
+            {
+                "choice_id": int(choice_id),
+                "from_node_id": int(self.node_ids[self.choice_from[i]]),
+                "taken": int(self.taken[i]),
+                "share": int(self.taken[i]) / int(departures[self.choice_from[i]]) if departures[self.choice_from[i]] else None
+            }
+            for i, choice_id in enumerate(self.choice_ids)
+        ]
+        return totals, node_rows, choice_rows
+
+    def _median_path_length(self) -> Optional[float]:
+        total = int(self.path_lengths.sum())
+        if not total:
+            return None
+        cumulative = np.cumsum(self.path_lengths)
+        lower, upper = np.searchsorted(cumulative, [(total - 1) // 2, total // 2], side="right")
+        return (int(lower) + int(upper)) / 2
+
+
+def _event_columns(story_id: int):
+    # Served in order by ix_choice_events_story_user
+    return select(
+        func.coalesce(ChoiceEvent.user_id, -1), ChoiceEvent.choice_id
+    ).filter(
+        ChoiceEvent.story_id == story_id
+    ).order_by(
+        ChoiceEvent.user_id, ChoiceEvent.created_at, ChoiceEvent.event_id
+    )
+
+
+async def compute_story_funnel(db: AsyncSession, story_id: int, chunk_size: int = settings.ANALYTICS_CHUNK_SIZE):
+    """Stream a story's choice history through a FunnelAccumulator; returns its `finish()` result"""
+    nodes, choices = await load_story_structure_async(db, story_id)
+    accumulator = FunnelAccumulator(nodes, choices)
+
+    result = await db.stream(_event_columns(story_id).execution_options(yield_per=chunk_size))
+    async for rows in result.partitions():
+        events = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        await run_in_threadpool(accumulator.add_chunk, events[:, 0], events[:, 1])
+
+    return await run_in_threadpool(accumulator.finish)
+
+
+async def rebuild_story_funnel(db: AsyncSession, story_id: int) -> bool:
+    """Recompute a story's rollup rows; False if the story does not exist"""
+    exists = (await db.execute(select(Story.story_id).filter(Story.story_id == story_id))).scalar_one_or_none()
+    if exists is None:
+        return False
+
+    totals, node_rows, choice_rows = await compute_story_funnel(db, story_id)
+
+    await db.execute(delete(StoryFunnel).where(StoryFunnel.story_id == story_id))
+    await db.execute(delete(StoryNodeFunnel).where(StoryNodeFunnel.story_id == story_id))
+    await db.execute(delete(StoryChoiceFunnel).where(StoryChoiceFunnel.story_id == story_id))
+    await db.execute(insert(StoryFunnel).values(story_id=story_id, **vars(totals)))
+    for model, rows in ((StoryNodeFunnel, node_rows), (StoryChoiceFunnel, choice_rows)):
+        for start in range(0, len(rows), ROLLUP_INSERT_BATCH):
+            await db.execute(insert(model), [
+                {"story_id": story_id, **row} for row in rows[start:start + ROLLUP_INSERT_BATCH]
+            ])
+    await db.commit()
+    return True
+
+
+class FunnelRollups:
+    """Runs rollups in the background, at most one at a time per story"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._running: Set[int] = set()
+
+    def is_running(self, story_id: int) -> bool:
+        return story_id in self._running
+
+    async def run(self, story_id: int):
+        if story_id in self._running:
+            return
+        self._running.add(story_id)
+        try:
+            async with self.session_factory() as db:
+                await rebuild_story_funnel(db, story_id)
+        except Exception:
+            logger.exception("Funnel rollup for story %s failed", story_id)
+        finally:
+            self._running.discard(story_id)
+
+
+async def get_story_funnel(db: AsyncSession, story_id: int):
+    """The stored rollup of a story as (StoryFunnel, node rows, choice rows), or None if never computed"""
+    funnel = (await db.execute(
+        select(StoryFunnel).filter(StoryFunnel.story_id == story_id)
+    )).scalar_one_or_none()
+    if funnel is None:
+        return None
+
+    nodes: List[StoryNodeFunnel] = (await db.execute(
+        select(StoryNodeFunnel).filter(StoryNodeFunnel.story_id == story_id).order_by(StoryNodeFunnel.node_id)
+    )).scalars().all()
+    choices: List[StoryChoiceFunnel] = (await db.execute(
+        select(StoryChoiceFunnel).filter(StoryChoiceFunnel.story_id == story_id)
+        .order_by(StoryChoiceFunnel.from_node_id, StoryChoiceFunnel.choice_id)
+    )).scalars().all()
+    return funnel, nodes, choices
+
+
+funnel_rollups = FunnelRollups(AsyncSessionLocal)
@@ -1,62 +1,77 @@
+import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext 
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 
 from app.models import user as user_model
-from app.schemas.user_schemas import UserCreate
 from app.database import get_db # Your DB session dependency
+from app.services.principal_cache import Principal, TokenPrincipal, principal_cache
+from app.services.token_revocation import revocation_store
+from app.utils.password_utils import PasswordPoolFull, password_pool
 from config import settings # Import settings from your config file
 
-# password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 setup
 oauth2 = OAuth2PasswordBearer(tokenUrl="/auth/login")
+oauth2_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
-# password Utility Functions
-def verify_password(plain_password: str, password_hash: str) -> bool:
-    return pwd_context.verify(plain_password, password_hash)
+# password Utility Functions; bcrypt runs in the password process pool, off the event loop
+def _password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_password_async(plain_password: str, password_hash: str) -> bool:
+    try:
+        return await password_pool.verify(plain_password, password_hash)
+    except PasswordPoolFull:
+        raise _password_pool_busy()
+
+async def get_password_hash_async(password: str) -> str:
+    try:
+        return await password_pool.hash(password)
+    except PasswordPoolFull:
+        raise _password_pool_busy()
 
 # 4. Core Authentication and User Functions
 def get_user_email(db: Session, email: str) -> Optional[user_model.User]:
     return db.query(user_model.User).filter(user_model.User.email == email).first()
 
-def create_user(db: Session, user_data: UserCreate) -> user_model.User:
-    password_hash = get_password_hash(user_data.password)
-    db_user = user_model.User(
-        username=user_data.username,
-        email=user_data.email,
-        password_hash=password_hash
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
-
-def authenticate_user(db: Session, email: str, password: str) -> Optional[user_model.User]:
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> Optional[user_model.User]:
     """
     Authenticates a user.
     - Fetches the user by email.
-    - Verifies the provided password against the stored hash.
+    - Verifies the provided password against the stored hash, in the password pool.
     - Returns the user object on success, otherwise None.
+
+    A hash made with other parameters than the current ones (e.g. a
+    changed BCRYPT_ROUNDS) is replaced by a fresh one on success, so cost
+    changes roll out as users log in.
     """
-    user = get_user_email(db, email)
+    result = await db.execute(select(user_model.User).filter(user_model.User.email == email))
+    user = result.scalars().first()
     if not user:
         return None
-    # Safely get the password_hash value
     password_hash = getattr(user, "password_hash", None)
     if not isinstance(password_hash, str):
         return None
-    if not verify_password(password, password_hash):
+    try:
+        verified, new_hash = await password_pool.verify_and_update(password, password_hash)
+    except PasswordPoolFull:
+        raise _password_pool_busy()
+    if not verified:
         return None
+    if new_hash:
+        # Same password under new parameters: password_version stays, so other sessions keep their refresh tokens
+        user.password_hash = new_hash
+        await db.commit()
     return user
 
 # 5. JWT Handling Functions
@@ -69,40 +84,158 @@ def create_access_token(data: dict) -> str:
     expire_minutes = getattr(settings, 'ACCESS_TOKEN_EXPIRE_MINUTES', 30)
     expire = datetime.now(timezone.utc) + timedelta(minutes=expire_minutes)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(user_id: int, password_version: int, family_id: Optional[str] = None) -> str:
+    """
+    A long-lived token that can be exchanged once for a new token pair.
+
+    `jti` identifies this token and `fid` the chain of tokens rotated from
+    the same login, so a whole session can be revoked at once. `pwv` is the
+    user's password_version it was issued under; a password change retires
+    it, rehashing the same password on login does not.
+    """
+    expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode = {
+        "user_id": user_id,
+        "type": "refresh",
+        "jti": secrets.token_hex(16),
+        "fid": family_id or secrets.token_hex(16),
+        "pwv": password_version,
+        "exp": expire
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def create_token_pair(user: user_model.User, family_id: Optional[str] = None) -> dict:
+    return {
+        "access_token": create_access_token(data={"user_id": user.user_id}),
+        "refresh_token": create_refresh_token(user.user_id, user.password_version or 0, family_id),
+        "token_type": "bearer"
+    }
+
+def _decode_refresh_token(token: str) -> dict:
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise invalid
+    if payload.get("type") != "refresh" or not all(payload.get(claim) for claim in ("user_id", "jti", "fid", "exp")):
+        raise invalid
+    if not isinstance(payload.get("pwv"), int):
+        raise invalid
+    return payload
+
+def _family_expiry() -> float:
+    # Latest expiry any token of a family can have, since rotation keeps extending it
+    return (datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)).timestamp()
+
+def _revoked_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token has been revoked",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> dict:
+    """
+    Exchange a refresh token for a new access and refresh token pair.
+
+    Costs a signature check, a lookup in the in-memory revocation set and
+    a primary-key read of the user. The presented token is revoked;
+    presenting an already rotated token again means it was copied, so its
+    whole family is revoked. So is a family whose user was deleted or
+    changed their password since it was issued.
+    """
+    payload = _decode_refresh_token(token)
+    if revocation_store.is_revoked(payload["jti"], payload["fid"]):
+        revocation_store.revoke(payload["fid"], _family_expiry())
+        raise _revoked_refresh_token()
+
+    user = await db.get(user_model.User, int(payload["user_id"]))
+    if user is None or (user.password_version or 0) != payload["pwv"]:
+        revocation_store.revoke(payload["fid"], _family_expiry())
+        raise _revoked_refresh_token()
+
+    revocation_store.revoke(payload["jti"], payload["exp"])
+    return create_token_pair(user, payload["fid"])
+
+def revoke_refresh_token(token: str):
+    """End the session a refresh token belongs to (every token rotated from the same login)"""
+    payload = _decode_refresh_token(token)
+    revocation_store.revoke(payload["fid"], _family_expiry())
+
 
 
 # 6. Protected Route Dependency
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _decode_access_token(token: str) -> dict:
+    """Verify an access token and return its claims, with user_id checked to be an integer"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if payload.get("user_id") is None or payload.get("type") == "refresh":
+            raise _credentials_exception()
+        int(payload["user_id"])
+    except (JWTError, ValueError, TypeError):
+        raise _credentials_exception()
+    return payload
+
 def get_current_user(
     token: str = Depends(oauth2),
     db: Session = Depends(get_db)
-) -> user_model.User:
+) -> Principal:
     """
     A dependency to be used in protected routes.
     
-    - Decodes the JWT from the request's Authorization header.
+    - Returns the cached principal if this token was verified recently.
+    - Otherwise decodes the JWT from the request's Authorization header.
     - Validates the token and extracts the user ID.
-    - Fetches the user from the database.
+    - Fetches the user from the database and caches a detached Principal.
     - Raises HTTPException if the token is invalid or the user doesn't exist.
     """
-    credentials_exception = HTTPException(
-    status_code=status.HTTP_401_UNAUTHORIZED, 
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("user_id")
-        if user_id is None:
-            raise credentials_exception
-        user_id = int(user_id)
-    except (JWTError, ValueError, TypeError):
-        raise credentials_exception
+    digest = principal_cache.digest(token)
+    principal = principal_cache.get(digest)
+    if principal is not None:
+        return principal
+
+    payload = _decode_access_token(token)
+    user_id = int(payload["user_id"])
     user = db.query(user_model.User).filter(user_model.User.user_id == user_id).first()
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+
+    principal = Principal.from_user(user, payload)
+    principal_cache.put(digest, principal, payload.get("exp"))
+    return principal
+
+
+async def get_current_user_optional(
+    token: Optional[str] = Depends(oauth2_optional)
+) -> Optional[TokenPrincipal]:
+    """
+    For routes that also serve anonymous players and only need the caller's id.
+
+    - Returns None when no bearer token is sent, without touching the database.
+    - Otherwise verifies the token and returns its user_id and claims; a
+      token that is sent must still be valid.
+    - Runs on the event loop and never reads the users row; routes that
+      need the user's fields depend on `get_current_user` instead.
+    """
+    if token is None:
+        return None
+    principal = principal_cache.get(principal_cache.digest(token))
+    if principal is not None:
+        return TokenPrincipal(principal.user_id, principal.claims)
+    payload = _decode_access_token(token)
+    return TokenPrincipal(int(payload["user_id"]), payload)
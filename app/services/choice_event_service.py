@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.choice_event import ChoiceEvent
+from app.utils.flushers import BackgroundFlusher, register_flusher
+from config import settings
+
+# Rows per INSERT when the buffer is drained
+CHOICE_EVENT_INSERT_BATCH = 5000
+
+# user_id, story_id, from_node_id, choice_id, created_at
+EventRow = Tuple[Optional[int], int, int, int, datetime]
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(start: datetime) -> datetime:
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_statements(first_month: datetime, months_ahead: int) -> List[str]:
+    """DDL for the monthly partitions from `first_month` on, plus the catch-all default partition"""
+    statements = [
+        "CREATE TABLE IF NOT EXISTS choice_events_default PARTITION OF choice_events DEFAULT"
+    ]
+    start = _month_start(first_month)
+    for _ in range(months_ahead + 1):
+        end = _next_month(start)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS choice_events_{start:%Y_%m} PARTITION OF choice_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+    return statements
+
+
+class ChoiceEventLog(BackgroundFlusher):
+    """
+    Buffered writer for the choice_events log.
+
+    `record()` only appends a tuple in memory; the background loop drains
+    the buffer with multi-row INSERTs every `interval` seconds, when
+    `max_pending` events are waiting, or on shutdown. Before writing into a
+    month it has not seen yet it makes sure that month's partitions exist.
+    """
+
+    def __init__(self, session_factory, interval: float, max_pending: int, partition_months_ahead: int):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.max_pending = max_pending
+        self.partition_months_ahead = partition_months_ahead
+        self._pending: List[EventRow] = []
+        self._partitioned_months: Set[datetime] = set()
+
+    def record(self, user_id: Optional[int], story_id: int, from_node_id: int, choice_id: int):
+        self.record_many(user_id, story_id, [(from_node_id, choice_id)])
+
+    def record_many(self, user_id: Optional[int], story_id: int, steps: List[Tuple[int, int]]):
+        """Append one event per (from_node_id, choice_id) step, in play order"""
+        now = datetime.now(timezone.utc)
+        self._pending.extend(
+            (user_id, story_id, from_node_id, choice_id, now)
+            for from_node_id, choice_id in steps
+        )
+        if len(self._pending) >= self.max_pending:
+            self.request_flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        try:
+            async with self.session_factory() as db:
+                await self._ensure_partitions(db, {_month_start(row[4]) for row in batch})
+                for start in range(0, len(batch), CHOICE_EVENT_INSERT_BATCH):
+                    await db.execute(insert(ChoiceEvent), [
+                        {
+                            "user_id": user_id,
+                            "story_id": story_id,
+                            "from_node_id": from_node_id,
+                            "choice_id": choice_id,
+                            "created_at": created_at
+                        }
+                        for user_id, story_id, from_node_id, choice_id, created_at
+                        in batch[start:start + CHOICE_EVENT_INSERT_BATCH]
+                    ])
+                await db.commit()
+        except Exception:
+            # Keep play order: the failed batch goes back in front of newer events
+            self._pending = batch + self._pending
+            raise
+
+    async def _ensure_partitions(self, db: AsyncSession, months: Set[datetime]):
+        missing = months - self._partitioned_months
+        if not missing or db.bind.dialect.name != "postgresql":
+            return
+        for statement in partition_statements(min(missing), self.partition_months_ahead):
+            await db.execute(text(statement))
+        await db.commit()
+
+        start = min(missing)
+        for _ in range(self.partition_months_ahead + 1):
+            self._partitioned_months.add(start)
+            start = _next_month(start)
+
+
+choice_event_log = register_flusher(ChoiceEventLog(
+    AsyncSessionLocal,
+    interval=settings.CHOICE_EVENT_FLUSH_INTERVAL,
+    max_pending=settings.CHOICE_EVENT_FLUSH_MAX_PENDING,
+    partition_months_ahead=settings.CHOICE_EVENT_PARTITION_MONTHS_AHEAD
+))
@@ -0,0 +1,126 @@
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import AsyncSessionLocal
+from app.models.choice_counter import ChoiceCounter
+from app.services.story_service import CompiledNode
+from app.utils.flushers import BackgroundFlusher, register_flusher
+from config import settings
+
+# (story_id, from_node_id, choice_id)
+CounterKey = Tuple[int, int, int]
+
+
+class ChoiceCounters(BackgroundFlusher):
+    """
+    Per-choice pick counts behind the live "what other players chose" figures.
+
+    `increment()` bumps a plain in-memory Counter: the game engine runs on
+    the event loop, so there is nothing to lock, and each worker process is
+    its own shard. Every `interval` seconds the pending deltas are added to
+    choice_counters with one UPSERT, and the totals of the stories players
+    have been looking at are re-read in one SELECT, which is how counts from
+    other workers arrive. Reads combine that snapshot with this worker's
+    unflushed deltas and never touch the database.
+    """
+
+    def __init__(self, session_factory, interval: float, max_stories: int):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.max_stories = max_stories
+        self._pending: Counter = Counter()
+        # story_id -> {choice_id: taken} as of the last refresh, least recently read first
+        self._snapshots: "OrderedDict[int, Dict[int, int]]" = OrderedDict()
+
+    def increment(self, story_id: int, from_node_id: int, choice_id: int, count: int = 1):
+        self._pending[(story_id, from_node_id, choice_id)] += count
+
+    def node_stats(self, node: CompiledNode) -> List[dict]:
+        """ChoiceStat dicts for a node's choices, in choice order"""
+        snapshot = self._snapshots.get(node.story_id)
+        if snapshot is None:
+            # Picked up by the next refresh; until then only this worker's counts are known
+            snapshot = self._snapshots[node.story_id] = {}
+            self._evict()
+        else:
+            self._snapshots.move_to_end(node.story_id)
+
+        counts = [
+            snapshot.get(choice.choice_id, 0)
+            + self._pending.get((node.story_id, node.node_id, choice.choice_id), 0)
+            for choice in node.choices
+        ]
+        total = sum(counts)
+        return [
+            {
+                "choice_id": choice.choice_id,
+                "times_chosen": count,
+                "percentage": round(100 * count / total, 1) if total else 0.0
+            }
+            for choice, count in zip(node.choices, counts)
+        ]
+
+    def _evict(self):
+        while len(self._snapshots) > self.max_stories:
+            self._snapshots.popitem(last=False)
+
+    async def flush(self):
+        if not self._pending and not self._snapshots:
+            return
+
+        batch, self._pending = self._pending, Counter()
+        async with self.session_factory() as db:
+            if batch:
+                # Keep the flushed counts visible until the refresh brings them back from the table
+                self._fold(batch, 1)
+                try:
+                    await self._apply(db, batch)
+                    await db.commit()
+                except Exception:
+                    self._fold(batch, -1)
+                    self._pending.update(batch)
+                    raise
+            await self._refresh(db)
+
+    def _fold(self, batch: Counter, sign: int):
+        for (story_id, _, choice_id), count in batch.items():
+            snapshot = self._snapshots.get(story_id)
+            if snapshot is not None:
+                snapshot[choice_id] = snapshot.get(choice_id, 0) + sign * count
+
+    async def _apply(self, db: AsyncSession, batch: Counter):
+        stmt = pg_insert(ChoiceCounter).values([
+            {"choice_id": choice_id, "story_id": story_id, "from_node_id": from_node_id, "taken": count}
+            for (story_id, from_node_id, choice_id), count in batch.items()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[ChoiceCounter.choice_id],
+            set_={"taken": ChoiceCounter.taken + stmt.excluded.taken}
+        ))
+
+    async def _refresh(self, db: AsyncSession):
+        story_ids = list(self._snapshots)
+        if not story_ids:
+            return
+        result = await db.execute(
+            select(ChoiceCounter.story_id, ChoiceCounter.choice_id, ChoiceCounter.taken)
+            .filter(ChoiceCounter.story_id.in_(story_ids))
+        )
+        fresh: Dict[int, Dict[int, int]] = {story_id: {} for story_id in story_ids}
+        for story_id, choice_id, taken in result.all():
+            fresh[story_id][choice_id] = taken
+        # Stories evicted while the query ran stay evicted
+        for story_id, counts in fresh.items():
+            if story_id in self._snapshots:
+                self._snapshots[story_id] = counts
+
+
+choice_counters = register_flusher(ChoiceCounters(
+    AsyncSessionLocal,
+    interval=settings.CHOICE_STATS_FLUSH_INTERVAL,
+    max_stories=settings.CHOICE_STATS_MAX_STORIES
+))
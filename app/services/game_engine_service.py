@@ -1,58 +1,66 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Dict, List, Optional, Set
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
 from app.models.story import Story, StoryNode
 from app.models.choice import Choice
 from app.models.user_progress import UserProgress
-from app.models.user import User, UserStats
+from app.services.story_service import (
+    CompiledChoice, CompiledNode, StoryGraph, encode_node,
+    get_story_graph_async, get_story_graph_for_node_async, story_graph_cache
+)
+from app.services.progress_service import ProgressStore, progress_store
+from app.services.choice_event_service import ChoiceEventLog, choice_event_log
+from app.services.stats_service import StatsAggregator, stats_aggregator
+from app.services.choice_stats_service import ChoiceCounters, choice_counters
+from app.services.play_session_service import PlaySessionTracker, play_sessions
+from app.services.sketch_service import PlayerSketchStore, STORY_WIDE, player_sketches
+from app.services.popularity_service import PopularityCounters, popularity_counters
+from app.services.hint_service import get_node_hint_async, hint_indexer
+from app.services.game_state_service import GameState, decode_game_state, encode_game_state
+from app.services.validation_service import (
+    analyze_story_structure, load_story_structure_async
+)
+from app.utils.json_response import dumps_bytes, splice_fields
+from app.utils.cache import CacheBackend, cache as default_cache, hints_tag, story_tag
 from app.schemas.engine_schemas import (
-    NodeResponse, ChoiceRequest, ChoiceResponse as GameChoiceResponse, 
-    ValidationResult
+    ChoiceRequest, ChoiceBatchRequest, ChoiceStep, ValidationResult, EndingHint, HintResponse, UniquePlayersResponse
 )
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 
-class GameEngine:
-    def __init__(self,db):
-        self.db = db
-
-    def start_story(self,story_id:int,user_id:Optional[int] = None) -> NodeResponse:
-        """Start a new story session"""
-
-        story = self.db.query(Story).filter(Story.story_id == story_id).first()
+class BaseGameEngine:
+    """Graph navigation shared by the single-choice and batch paths"""
 
-        if not story:
+    def _require_playable(self, graph: Optional[StoryGraph]) -> CompiledNode:
+        """Return the starting node of a published story or raise"""
+        if not graph:
             raise HTTPException(
                 status_code=404,
                 detail="Story not found"
             )
         
-        if not story.is_published:
+        if not graph.is_published:
             raise HTTPException(status_code=400, detail="Story is not published")
         
         #find starting node
-        starting_node = self.db.query(StoryNode).filter(
-            and_(
-                StoryNode.story_id == story_id,
-                StoryNode.is_starting_node == True
-            )
-        ).first()
+        starting_node = graph.start_node
 
         if not starting_node:
             raise HTTPException(status_code=400, detail="Story has no starting node")
-        
-        # Create or update user progress if user is logged in
 
-        if user_id:
-            self._create_or_update_progress(user_id,story_id,starting_node.node_id)
+        return starting_node
 
-        return self._create_node_response(starting_node)
-    
-    def make_choice(self,choice_request:ChoiceRequest) -> GameChoiceResponse:
-        """Process a player's choice and return the next node"""
-        # Validate the choice
-        choice = self.db.query(Choice).filter(
-            Choice.choice_id == choice_request.choice_id
-        ).first()
+    def _resolve_choice(
+        self,
+        graph: Optional[StoryGraph],
+        choice_request: Union[ChoiceRequest, ChoiceStep]
+    ) -> Tuple[CompiledChoice, CompiledNode]:
+        """Validate a choice against the story graph and return it with its destination"""
+        choice = graph.get_choice(choice_request.choice_id) if graph else None
 
         if not choice:
             raise HTTPException(status_code=404, detail="Choice not found")
@@ -65,272 +73,457 @@ class GameEngine:
         )
 
         #Get the destination node
-        next_node = self.db.query(StoryNode).filter(StoryNode.node_id == choice.to_node_id).first()
+        next_node = graph.get_node(choice.to_node_id)
 
         if not next_node:
             raise HTTPException(status_code=404,detail="Destination node not found")
-        
+
+        return choice, next_node
+
+
+class AsyncGameEngine(BaseGameEngine):
+    """Game engine that runs on an AsyncSession (asyncpg)"""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        progress_store: ProgressStore = progress_store,
+        event_log: ChoiceEventLog = choice_event_log,
+        stats: StatsAggregator = stats_aggregator,
+        cache: CacheBackend = default_cache,
+        counters: ChoiceCounters = choice_counters,
+        sessions: PlaySessionTracker = play_sessions,
+        sketches: PlayerSketchStore = player_sketches,
+        popularity: PopularityCounters = popularity_counters
+    ):
+        self.db = db
+        self.cache = cache
+        self.progress_store = progress_store
+        self.event_log = event_log
+        self.stats = stats
+        self.counters = counters
+        self.sessions = sessions
+        self.sketches = sketches
+        self.popularity = popularity
+
+    async def start_story(
+        self,
+        story_id: int,
+        user_id: Optional[int] = None,
+        stateless: bool = False,
+        choice_stats: bool = False
+    ) -> bytes:
+        """Start a new story session; returns encoded NodeResponse JSON (GameStartResponse when stateless)"""
+        graph = await get_story_graph_async(self.db, story_id)
+        starting_node = self._require_playable(graph)
+        self.popularity.record_play(story_id)
+
+        # Create or update user progress if user is logged in
+        if user_id:
+            self.sketches.record(user_id, story_id, [starting_node.node_id])
+            await self._create_or_update_progress(user_id, story_id, starting_node.node_id)
+
+        encoded = self._encoded_node(graph, starting_node, choice_stats)
+        if stateless:
+            state = GameState(story_id, starting_node.node_id, graph.version)
+            return splice_fields(encoded, state_token=encode_game_state(state))
+        return encoded
+
+    async def make_choice(
+        self,
+        choice_request: ChoiceRequest,
+        user_id: Optional[int] = None,
+        choice_stats: bool = False
+    ) -> bytes:
+        """Process a player's choice; returns encoded ChoiceResponse JSON"""
+        state = None
+        if choice_request.state_token:
+            # Stateless mode: the token, not the database, says where the player is
+            state, graph = await self._resume_state(choice_request.state_token)
+            if choice_request.current_node_id != state.node_id:
+                raise HTTPException(status_code=400, detail="Choice does not continue from the game state")
+        else:
+            graph = await get_story_graph_for_node_async(self.db, choice_request.current_node_id)
+        choice, next_node = self._resolve_choice(graph, choice_request)
+        # Every player feeds the analytics, stateless ones included. The event, counter and
+        # popularity buffers are flushed in background batches, never on the request path
+        self.event_log.record(user_id, next_node.story_id, choice.from_node_id, choice.choice_id)
+        self.counters.increment(next_node.story_id, choice.from_node_id, choice.choice_id)
+        if next_node.is_ending_node:
+            self.popularity.record_completion(next_node.story_id)
+
         # Update user progress if user is logged in
         progress_saved = False
-        if choice_request.user_id:
-            progress_saved = self._update_user_progress(
-                choice_request.user_id,
+        if user_id:
+            self._record_stats(user_id, graph, 1, next_node.is_ending_node)
+            self.sketches.record(user_id, next_node.story_id, [next_node.node_id])
+            progress_saved = await self._update_user_progress(
+                user_id,
                 next_node.story_id,
                 next_node.node_id,
-                choice.choice_id,
                 next_node.is_ending_node
             )
 
-        return GameChoiceResponse(
-            success=True,
-            next_node=self._create_node_response(next_node),
-            consequences=choice.consequences,
-            is_ending=next_node.is_ending_node,
-            progress_saved=progress_saved
+        encoded = graph.encoded_choice_result(
+            choice.choice_id, self._encoded_node(graph, next_node, True) if choice_stats else None
+        )
+        encoded = splice_fields(encoded, progress_saved=progress_saved)
+        if state is not None:
+            state = state.advance(next_node.node_id, choice.choice_letter)
+            return splice_fields(encoded, state_token=encode_game_state(state))
+        return encoded
+
+    async def _resume_state(self, token: str) -> Tuple[GameState, StoryGraph]:
+        """Verify a state token and pair it with the current graph of its story"""
+        try:
+            state = decode_game_state(token)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        graph = await get_story_graph_async(self.db, state.story_id)
+        self._require_playable(graph)
+
+        if state.story_version != graph.version:
+            if graph.get_node(state.node_id) is None:
+                raise HTTPException(status_code=409, detail="Story has changed since this game started; please restart it")
+            # The recorded letters no longer replay against the edited story; keep the position only
+            state = GameState(state.story_id, state.node_id, graph.version)
+        return state, graph
+
+    async def make_choices(self, batch: ChoiceBatchRequest, user_id: Optional[int] = None) -> bytes:
+        """Apply an ordered path of choices in one pass; returns encoded ChoiceBatchResponse JSON"""
+        graph = await get_story_graph_async(self.db, batch.story_id)
+
+        if not graph:
+            raise HTTPException(status_code=404, detail="Story not found")
+
+        # Validate the whole path before persisting anything
+        steps: List[Tuple[int, int]] = []
+        next_node = None
+        for index, step in enumerate(batch.steps):
+            if next_node is not None and step.current_node_id != next_node.node_id:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Step {index} does not continue from node {next_node.node_id}"
+                )
+            try:
+                choice, next_node = self._resolve_choice(graph, step)
+            except HTTPException as exc:
+                raise HTTPException(status_code=exc.status_code, detail=f"Step {index}: {exc.detail}")
+            steps.append((choice.from_node_id, choice.choice_id))
+
+        # Log the whole path, then persist only the final position
+        self.event_log.record_many(user_id, graph.story_id, steps)
+        for from_node_id, choice_id in steps:
+            self.counters.increment(graph.story_id, from_node_id, choice_id)
+        if next_node.is_ending_node:
+            self.popularity.record_completion(graph.story_id)
+        progress_saved = False
+        if user_id:
+            self._record_stats(user_id, graph, len(steps), next_node.is_ending_node)
+            self.sketches.record(user_id, graph.story_id, {graph.choices[choice_id].to_node_id for _, choice_id in steps})
+            progress_saved = await self._update_user_progress(
+                user_id,
+                graph.story_id,
+                next_node.node_id,
+                next_node.is_ending_node
+            )
+
+        return (
+            b'{"success":true,"steps_applied":' + dumps_bytes(len(batch.steps))
+            + b',"next_node":' + graph.encoded_node(next_node.node_id)
+            + b',"is_ending":' + dumps_bytes(next_node.is_ending_node)
+            + b',"progress_saved":' + dumps_bytes(progress_saved)
+            + b'}'
         )
 
-    def get_current_node(self,story_id:int,user_id : int) -> NodeResponse:
-        """Get the current node for a user's story progress"""
-        progress = self.db.query(UserProgress).filter(
-            and_(
-                UserProgress.user_id == user_id,
-                UserProgress.story_id == story_id,
-                UserProgress.is_completed == False
+    async def get_current_node(self, story_id: int, user_id: int, choice_stats: bool = False) -> bytes:
+        """Get the current node for a user's story progress; returns encoded NodeResponse JSON"""
+        pending = self.progress_store.get_pending(user_id, story_id)
+        if pending is not None:
+            current_node_id = None if pending.is_completed else pending.current_node_id
+        else:
+            result = await self.db.execute(
+                select(UserProgress.current_node_id).filter(
+                    UserProgress.user_id == user_id,
+                    UserProgress.story_id == story_id,
+                    UserProgress.is_completed == False
+                )
             )
-        ).first()
+            current_node_id = result.scalars().first()
 
-        if not progress:
+        if current_node_id is None:
             # Return starting node if no progress exists
-            return self.start_story(story_id,user_id)
-        
-        current_node = self.db.query(StoryNode).filter(StoryNode.node_id == progress.current_node_id).first()
+            return await self.start_story(story_id, user_id, choice_stats=choice_stats)
+
+        graph = await get_story_graph_async(self.db, story_id)
+        current_node = graph.get_node(current_node_id) if graph else None
 
         if not current_node:
             raise HTTPException(status_code=404, detail="Current node not found")
-        
-        return self._create_node_respones(current_node)
-    
-    def validate_story(self,story_id:int) -> ValidationResult:
-        """Validate story structure for completeness and logic"""
-        issues = []
-
-        # Get all nodes and choices for the story
-        nodes = self.db.query(StoryNode).filter(StoryNode.story_id == story_id).all()
-        all_choices = self.db.query(Choice).join(
-            StoryNode,Choice.from_node_id == StoryNode.node_id
-        ).filter(StoryNode.story_id == story_id).all()
-
-        if not nodes:
-            issues.append("Story has no nodes")
-            return ValidationResult(
-                is_valid = False,
-                issues = issues,
-                total_nodes=0,
-                total_choices=0
-            )
 
-        
-        # Check for starting node
-        starting_nodes = [n for n in nodes if n.is_starting_node]
-        if len(starting_nodes) == 0:
-            issues.append("Story has no starting node")
-        elif len(starting_nodes) > 1:
-            issues.append("Story has multiple starting nodes")
-        
-        # Check for ending nodes
-        ending_nodes = [n for n in nodes if n.is_ending_node]
-        if len(ending_nodes) == 0:
-            issues.append("Story has no ending nodes")
-        
-        # Find unreachable nodes and dead ends
-        reachable_nodes = self._find_reachable_nodes(nodes, all_choices)
-        unreachable_nodes = [n.node_id for n in nodes if n.node_id not in reachable_nodes]
-        
-        dead_ends = self._find_dead_ends(nodes, all_choices)
-        
-        if unreachable_nodes:
-            issues.append(f"Unreachable nodes found: {unreachable_nodes}")
-        
-        if dead_ends:
-            issues.append(f"Dead end nodes found: {dead_ends}")
-        
-        # Check for choice letter conflicts
-        choice_conflicts = self._find_choice_conflicts(all_choices)
-        if choice_conflicts:
-            issues.extend(choice_conflicts)
-        
-        return ValidationResult(
-            is_valid=len(issues) == 0,
-            issues=issues,
-            total_nodes=len(nodes),
-            total_choices=len(all_choices),
-            unreachable_nodes=unreachable_nodes,
-            dead_ends=dead_ends
+        return self._encoded_node(graph, current_node, choice_stats)
+
+    def _encoded_node(self, graph: StoryGraph, node: CompiledNode, choice_stats: bool) -> bytes:
+        """A node's cached encoding, with live choice percentages spliced in when asked for"""
+        encoded = graph.encoded_node(node.node_id)
+        if choice_stats:
+            return splice_fields(encoded, choice_stats=self.counters.node_stats(node))
+        return encoded
+
+    async def heartbeat(self, story_id: int, user_id: int):
+        """Count time the user spends playing a story; held in memory, never written per call"""
+        self._require_playable(await get_story_graph_async(self.db, story_id))
+        self.sessions.heartbeat(user_id, story_id)
+
+    async def get_in_progress(self, user_id: int, limit: int, cursor: Optional[str] = None) -> bytes:
+        """Every unfinished story of a user with its current node, newest first; returns encoded InProgressPage JSON"""
+        after = self._parse_cursor(cursor) if cursor else None
+
+        # One statement: a keyset page of progress rows joined to their nodes and ordered choices
+        page = select(
+            UserProgress.progress_id, UserProgress.story_id, UserProgress.current_node_id,
+            UserProgress.last_updated, Story.title
+        ).join(
+            Story, Story.story_id == UserProgress.story_id
+        ).filter(
+            UserProgress.user_id == user_id,
+            UserProgress.is_completed == False,
+            Story.is_published == True
         )
-
-    def _create_node_response(self, node: StoryNode) -> NodeResponse:
-        """Create a NodeResponse with choices"""
-        choices = self.db.query(Choice).filter(
-            Choice.from_node_id == node.node_id
-        ).order_by(Choice.choice_letter).all()
-        
-        choices_data = [
-            {
-                "choice_id": choice.choice_id,
-                "choice_text": choice.choice_text,
-                "choice_letter": choice.choice_letter,
-                "consequences": choice.consequences
-            }
-            for choice in choices
-        ]
-        
-        return NodeResponse(
-            node_id=node.node_id,
-            node_title=node.node_title,
-            content=node.content,
-            is_starting_node=node.is_starting_node,
-            is_ending_node=node.is_ending_node,
-            node_type=node.node_type,
-            choices=choices_data
+        if after is not None:
+            last_updated, progress_id = after
+            page = page.filter(or_(
+                UserProgress.last_updated < last_updated,
+                and_(UserProgress.last_updated == last_updated, UserProgress.progress_id < progress_id)
+            ))
+        page = page.order_by(
+            UserProgress.last_updated.desc(), UserProgress.progress_id.desc()
+        ).limit(limit + 1).subquery()
+
+        result = await self.db.execute(
+            select(page, StoryNode, Choice).join(
+                StoryNode, StoryNode.node_id == page.c.current_node_id
+            ).outerjoin(
+                Choice, Choice.from_node_id == StoryNode.node_id
+            ).order_by(page.c.last_updated.desc(), page.c.progress_id.desc(), Choice.choice_letter)
         )
 
-    def _create_or_update_progress(self, user_id: int, story_id: int, node_id: int):
-        """Create or update user progress"""
-        existing_progress = self.db.query(UserProgress).filter(
-            and_(
-                UserProgress.user_id == user_id,
-                UserProgress.story_id == story_id
-            )).first()
-        
-        if existing_progress:
-            existing_progress.current_node_id = node_id
-            existing_progress.is_completed = False
-        else:
-            new_progress = UserProgress(
-                user_id=user_id,
-                story_id=story_id,
-                current_node_id=node_id,
-                choice_node={},
-                is_completed=False
+        # Group the flat rows back into one entry per progress row
+        entries: Dict[int, list] = {}
+        for progress_id, story_id, _, last_updated, title, node, choice in result.all():
+            entry = entries.get(progress_id)
+            if entry is None:
+                entry = entries[progress_id] = [story_id, title, last_updated, node, []]
+            if choice is not None:
+                entry[4].append(choice)
+
+        next_cursor = None
+        if len(entries) > limit:
+            entries.popitem()
+            last_id = next(reversed(entries))
+            next_cursor = f"{entries[last_id][2].isoformat()}_{last_id}"
+
+        # Unflushed progress is newer than the row; its nodes are fetched together below
+        moved: Dict[int, int] = {}
+        for progress_id, (story_id, _, _, node, _) in list(entries.items()):
+            pending = self.progress_store.get_pending(user_id, story_id)
+            if pending is None:
+                continue
+            if pending.is_completed:
+                del entries[progress_id]
+            elif pending.current_node_id != node.node_id:
+                moved[story_id] = pending.current_node_id
+        pending_nodes = await self._encode_pending_nodes(moved)
+
+        stories = []
+        for story_id, title, last_updated, node, choices in entries.values():
+            encoded = pending_nodes.get(story_id) or encode_node(node, choices)
+            stories.append(
+                b'{"story_id":' + dumps_bytes(story_id)
+                + b',"story_title":' + dumps_bytes(title)
+                + b',"last_updated":' + dumps_bytes(last_updated.isoformat())
+                + b',"current_node":' + encoded + b'}'
             )
-            self.db.add(new_progress)
-        
-        self.db.commit()
-
-    def _update_user_progress(
-        self, 
-        user_id: int, 
-        story_id: int, 
-        node_id: int, 
-        choice_id: int,
-        is_completed: bool
-    ) -> bool:
-        """Update user progress with new choice"""
+
+        return b'{"stories":[' + b",".join(stories) + b'],"next_cursor":' + dumps_bytes(next_cursor) + b'}'
+
+    async def _encode_pending_nodes(self, moved: Dict[int, int]) -> Dict[int, bytes]:
+        """Encoded nodes for `{story_id: node_id}`, from cached graphs where possible and one query for the rest"""
+        encoded: Dict[int, bytes] = {}
+        missing: Dict[int, int] = {}
+        for story_id, node_id in moved.items():
+            graph = story_graph_cache.get(story_id)
+            if graph is None:
+                missing[node_id] = story_id
+            elif graph.get_node(node_id):
+                encoded[story_id] = graph.encoded_node(node_id)
+        if not missing:
+            return encoded
+
+        result = await self.db.execute(
+            select(StoryNode, Choice).outerjoin(
+                Choice, Choice.from_node_id == StoryNode.node_id
+            ).filter(StoryNode.node_id.in_(missing)).order_by(StoryNode.node_id, Choice.choice_letter)
+        )
+        nodes: Dict[int, Tuple[StoryNode, list]] = {}
+        for node, choice in result.all():
+            _, choices = nodes.setdefault(node.node_id, (node, []))
+            if choice is not None:
+                choices.append(choice)
+        for node_id, (node, choices) in nodes.items():
+            # A node moved to another story since the choice was buffered keeps the row's position
+            if node.story_id == missing[node_id]:
+                encoded[node.story_id] = encode_node(node, choices)
+        return encoded
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> Tuple[datetime, int]:
         try:
-            progress = self.db.query(UserProgress).filter(
-                and_(
-                    UserProgress.user_id == user_id,
-                    UserProgress.story_id == story_id
-                )
-            ).first()
-            
-            if not progress:
-                return False
-            
-            # Update progress
-            progress.current_node_id = node_id
-            progress.is_completed = is_completed
-            
-            # Update choice history
-            if not progress.choice_node:
-                progress.choice_node = {}
-            
-            progress.choice_node[str(progress.current_node_id)] = choice_id
-            
-            # Update user stats if story is completed
-            if is_completed:
-                self._update_user_stats(user_id, story_id)
-            
-            self.db.commit()
-            return True
-        except Exception:
-            self.db.rollback()
-            return False
+            last_updated, progress_id = cursor.rsplit("_", 1)
+            return datetime.fromisoformat(last_updated), int(progress_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    async def lookahead(self, node_id: int, depth: int) -> bytes:
+        """Return a node and every successor up to `depth` choices away; returns encoded LookaheadResponse JSON"""
+        graph = await get_story_graph_for_node_async(self.db, node_id)
+
+        if not graph:
+            raise HTTPException(status_code=404, detail="Node not found")
+
+        if not graph.is_published:
+            raise HTTPException(status_code=400, detail="Story is not published")
 
-    def _update_user_stats(self, user_id: int, story_id: int):
-        """Update user statistics when story is completed"""
-        stats = self.db.query(UserStats).filter(UserStats.user_id == user_id).first()
-        if not stats:
-            stats = UserStats(user_id=user_id)
-            self.db.add(stats)
-
-        stats.stories_completed += 1
-
-        #Update favorite category
-        story = self.db.query(Story).filter(Story.story_id == story_id).first()
-        if story not in story.category:
-            stats.favorite_category = story.category
-
-        self.db.commit()
-
-    def _find_reachable_nodes(self,nodes:List[StoryNode],choices:List[Choice]) -> set[int]:
-        """Find all nodes reachable from starting node"""
-        starting_nodes = [n for n in nodes if n.is_starting_node]
-        if not starting_nodes:
-            return set()
-
-        reachable = set()
-        to_visit = [starting_nodes[0].node_id]
-
-        #Build adjacency map
-        adjacency = {}
-        for choice in choices:
-            if choice.from_node_id not in adjacency:
-                adjacency[choice.from_node_id] = []
-            adjacency[choice.from_node_id].append(choice.to_node_id)
-
-        # BFS to find reachable nodes
-        while to_visit:
-            current = to_visit.pop(0)
-            if current in reachable:
+        # Breadth-first over the graph, emitting shared successors only once
+        seen = {node_id}
+        queue = deque([(node_id, 0)])
+        encoded_nodes = []
+        while queue:
+            current_id, level = queue.popleft()
+            node = graph.get_node(current_id)
+            if node is None:
                 continue
+            encoded_nodes.append(graph.encoded_node(current_id))
+            if level == depth:
+                continue
+            for choice in node.choices:
+                if choice.to_node_id not in seen:
+                    seen.add(choice.to_node_id)
+                    queue.append((choice.to_node_id, level + 1))
+
+        return (
+            b'{"node_id":' + dumps_bytes(node_id)
+            + b',"depth":' + dumps_bytes(depth)
+            + b',"nodes":[' + b",".join(encoded_nodes) + b']}'
+        )
 
-            reachable.add(current)
-            if current in adjacency:
-                to_visit.extend(adjacency[current])
-        
-        return reachable
-    
-    def _find_dead_ends(self, nodes: List[StoryNode], choices: List[Choice]) -> List[int]:
-        """Find nodes with no outgoing choices (except ending nodes)"""
-        nodes_with_choices = set(choice.from_node_id for choice in choices)
-        ending_nodes = set(n.node_id for n in nodes if n.is_ending_node)
-        
-        dead_ends = []
-        for node in nodes:
-            if (node.node_id not in nodes_with_choices and 
-                node.node_id not in ending_nodes):
-                dead_ends.append(node.node_id)
-        
-        return dead_ends
+    async def get_hint(self, node_id: int) -> bytes:
+        """Distance to the nearest ending and the fastest choice towards each ending; returns encoded HintResponse JSON"""
+        graph = await get_story_graph_for_node_async(self.db, node_id)
 
-    def _find_choice_conflicts(self,choices:List[Choice]) -> List[str]:
-        """Find choice letter conflicts within same nodes"""
+        if not graph:
+            raise HTTPException(status_code=404, detail="Node not found")
 
-        conflicts =[]
-        node_choices = {}
+        if not graph.is_published:
+            raise HTTPException(status_code=400, detail="Story is not published")
 
-        for choice in choices:
-            if choice.from_node_id not in node_choices:
-                node_choices[choice.from_node_id] = {}
+        key = f"hint:{node_id}"
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
 
-            letter = choice.choice_letter
-            if letter in node_choices[choices.from_node_id]:
-                conflicts.append(
-                    f"Node {choice.from_node_id} has duplicate choice letter '{letter}'"
-                )
-            else:
-                node_choices[choice.from_node_id][letter] = choice.choice_id
+        hint = await get_node_hint_async(self.db, node_id)
+        if hint is None:
+            # Published before hints existed, or a rebuild is pending; make sure one is queued
+            hint_indexer.mark_stale(graph.story_id)
+            raise HTTPException(status_code=404, detail="Hints are not available for this story yet")
+
+        endings = [
+            EndingHint(ending_node_id=int(ending_id), distance=distance, choice_id=choice_id)
+            for ending_id, (distance, choice_id) in hint.endings.items()
+        ]
+        endings.sort(key=lambda ending: (ending.distance, ending.ending_node_id))
+
+        encoded = HintResponse(
+            node_id=hint.node_id,
+            distance_to_ending=hint.distance_to_ending,
+            nearest_ending_id=hint.nearest_ending_id,
+            next_choice_id=hint.next_choice_id,
+            endings=endings
+        ).model_dump_json().encode("utf-8")
+        await self.cache.set(key, encoded, tags=[hints_tag(graph.story_id)])
+        return encoded
+
+    async def unique_players(self, story_id: Optional[int], node_id: Optional[int] = None, days: Optional[int] = None) -> bytes:
+        """Approximate distinct signed-in players of a story or node; returns encoded UniquePlayersResponse JSON"""
+        if node_id is not None:
+            graph = await get_story_graph_for_node_async(self.db, node_id)
+            if not graph:
+                raise HTTPException(status_code=404, detail="Node not found")
+            story_id = graph.story_id
+        else:
+            graph = await get_story_graph_async(self.db, story_id)
+            if not graph:
+                raise HTTPException(status_code=404, detail="Story not found")
+
+        sketch = await self.sketches.unique_players(
+            self.db, story_id, STORY_WIDE if node_id is None else node_id, days
+        )
+        return UniquePlayersResponse(
+            story_id=story_id,
+            node_id=node_id,
+            days=days,
+            unique_players=sketch.count(),
+            relative_error=sketch.relative_error
+        ).model_dump_json().encode("utf-8")
+
+    async def validate_story(self, story_id: int) -> bytes:
+        """Validate story structure for completeness and logic; returns encoded ValidationResult JSON"""
+        key = f"validation:{story_id}"
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        nodes, choices = await load_story_structure_async(self.db, story_id)
+        # CPU-bound on large stories; keep it off the event loop
+        result = await run_in_threadpool(analyze_story_structure, nodes, choices)
+        encoded = result.model_dump_json().encode("utf-8")
+        await self.cache.set(key, encoded, tags=[story_tag(story_id)])
+        return encoded
+
+    async def _create_or_update_progress(self, user_id: int, story_id: int, node_id: int):
+        """Create or update user progress"""
+        try:
+            await self.progress_store.save(self.db, user_id, story_id, node_id, is_completed=False)
+        except IntegrityError:
+            # Principals come from token claims alone, so the account may have been deleted since the token was issued
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=401,
+                detail="User no longer exists",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
 
-        return conflicts
+    async def _update_user_progress(
+        self,
+        user_id: int,
+        story_id: int,
+        node_id: int,
+        is_completed: bool
+    ) -> bool:
+        """Move the user's current position"""
+        try:
+            return await self.progress_store.save(
+                self.db, user_id, story_id, node_id,
+                is_completed=is_completed
+            )
+        except Exception:
+            await self.db.rollback()
+            return False
 
+    def _record_stats(self, user_id: int, graph: StoryGraph, choices_made: int, is_completed: bool):
+        """Hand choice and completion counts to the background stats aggregator"""
+        self.stats.record_choices(user_id, choices_made)
+        if is_completed:
+            self.stats.record_completion(user_id, graph.category)
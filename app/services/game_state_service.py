@@ -0,0 +1,73 @@
+import base64
+import hashlib
+import hmac
+import struct
+from dataclasses import dataclass
+from typing import Tuple
+
+from config import settings
+
+# Layout: format, story_id, node_id, story version digest, step count, then 2-bit choice letters, then the tag
+_FORMAT = 1
+_HEADER = struct.Struct(">BII8sH")
+_TAG_SIZE = 16
+_LETTERS = "ABCD"
+
+_signing_key = hashlib.sha256(b"game-state:" + settings.SECRET_KEY.encode("utf-8")).digest()
+
+
+@dataclass(frozen=True)
+class GameState:
+    """Where an anonymous player is in a story, carried by the client between requests"""
+    story_id: int
+    node_id: int
+    story_version: str                 # StoryGraph.version the history was recorded against
+    history: Tuple[str, ...] = ()      # choice letters taken from the starting node, most recent last
+
+    def advance(self, node_id: int, choice_letter: str) -> "GameState":
+        history = (self.history + (choice_letter,))[-settings.GAME_STATE_MAX_HISTORY:]
+        return GameState(self.story_id, node_id, self.story_version, history)
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_signing_key, payload, hashlib.sha256).digest()[:_TAG_SIZE]
+
+
+def _pack_letters(letters: Tuple[str, ...]) -> bytes:
+    packed = bytearray((len(letters) + 3) // 4)
+    for position, letter in enumerate(letters):
+        packed[position >> 2] |= _LETTERS.index(letter) << ((position & 3) * 2)
+    return bytes(packed)
+
+
+def _unpack_letters(packed: bytes, count: int) -> Tuple[str, ...]:
+    return tuple(
+        _LETTERS[(packed[position >> 2] >> ((position & 3) * 2)) & 3]
+        for position in range(count)
+    )
+
+
+def encode_game_state(state: GameState) -> str:
+    """Serialize and sign a game state as a URL-safe token"""
+    payload = _HEADER.pack(
+        _FORMAT, state.story_id, state.node_id, bytes.fromhex(state.story_version), len(state.history)
+    ) + _pack_letters(state.history)
+    return base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b"=").decode("ascii")
+
+
+def decode_game_state(token: str) -> GameState:
+    """Verify and parse a token from `encode_game_state`; raises ValueError if it is malformed or forged"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        raise ValueError("Malformed game state token")
+
+    payload, tag = raw[:-_TAG_SIZE], raw[-_TAG_SIZE:]
+    if len(payload) < _HEADER.size or not hmac.compare_digest(tag, _sign(payload)):
+        raise ValueError("Invalid game state token signature")
+
+    version, story_id, node_id, story_version, count = _HEADER.unpack_from(payload)
+    if version != _FORMAT or len(payload) != _HEADER.size + (count + 3) // 4:
+        raise ValueError("Unsupported game state token")
+
+    return GameState(story_id, node_id, story_version.hex(), _unpack_letters(payload[_HEADER.size:], count))
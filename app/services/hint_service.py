@@ -0,0 +1,130 @@
+import logging
+from collections import deque
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from starlette.concurrency import run_in_threadpool
+
+from app.database import AsyncSessionLocal
+from app.models.node_hint import NodeHint
+from app.models.story import Story
+from app.services.validation_service import NodeRow, ChoiceRow, load_story_structure_async
+from app.utils.flushers import BackgroundFlusher, register_flusher
+from app.utils.cache import CacheBackend, cache, hints_tag
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT when a story's hint table is rewritten
+HINT_INSERT_BATCH = 5000
+
+
+def compute_story_hints(story_id: int, nodes: Sequence[NodeRow], choices: Sequence[ChoiceRow]) -> List[dict]:
+    """
+    Build the hint rows of one story in O(endings * (V + E)).
+
+    Runs one reverse BFS per ending. The first time BFS reaches a node it
+    does so over a shortest edge, so that edge's choice is recorded as the
+    fastest way towards that ending without a second pass.
+    """
+    node_ids = [row[0] for row in nodes]
+    endings = [row[0] for row in nodes if row[2]]
+    in_story = set(node_ids)
+
+    incoming: Dict[int, List[tuple]] = {node_id: [] for node_id in node_ids}
+    for choice_id, from_node_id, to_node_id, _ in choices:
+        if to_node_id in in_story and from_node_id in in_story:
+            incoming[to_node_id].append((from_node_id, choice_id))
+
+    per_node: Dict[int, Dict[str, list]] = {node_id: {} for node_id in node_ids}
+    for ending_id in endings:
+        key = str(ending_id)
+        per_node[ending_id][key] = [0, None]
+        queue = deque([(ending_id, 0)])
+        while queue:
+            current, distance = queue.popleft()
+            for from_node_id, choice_id in incoming[current]:
+                found = per_node[from_node_id]
+                if key not in found:
+                    found[key] = [distance + 1, choice_id]
+                    queue.append((from_node_id, distance + 1))
+
+    rows = []
+    for node_id in node_ids:
+        found = per_node[node_id]
+        nearest: Optional[str] = min(found, key=lambda key: (found[key][0], int(key)), default=None)
+        rows.append({
+            "node_id": node_id,
+            "story_id": story_id,
+            "distance_to_ending": found[nearest][0] if nearest else None,
+            "nearest_ending_id": int(nearest) if nearest else None,
+            "next_choice_id": found[nearest][1] if nearest else None,
+            "endings": found
+        })
+    return rows
+
+
+async def get_node_hint_async(db: AsyncSession, node_id: int) -> Optional[NodeHint]:
+    result = await db.execute(select(NodeHint).filter(NodeHint.node_id == node_id))
+    return result.scalar_one_or_none()
+
+
+class HintIndexer(BackgroundFlusher):
+    """
+    Keeps the node_hints table in step with story graphs.
+
+    Authoring routes call `mark_stale()` after any change to a story or its
+    graph; the background loop rebuilds each stale story once per interval,
+    so a burst of edits costs one rebuild. Published stories get a fresh
+    table, unpublished ones have theirs removed.
+    """
+
+    def __init__(self, session_factory, interval: float, cache: CacheBackend):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.cache = cache
+        self._stale: Set[int] = set()
+        self._lock = Lock()    # authoring routes are sync and run on worker threads
+
+    def mark_stale(self, story_id: int):
+        with self._lock:
+            self._stale.add(story_id)
+
+    async def flush(self):
+        with self._lock:
+            batch, self._stale = self._stale, set()
+
+        failed = []
+        for story_id in batch:
+            try:
+                async with self.session_factory() as db:
+                    await self.rebuild(db, story_id)
+                await self.cache.invalidate_tags(hints_tag(story_id))
+            except Exception:
+                logger.exception("Rebuilding hints for story %s failed", story_id)
+                failed.append(story_id)
+
+        # Retry on the next pass
+        with self._lock:
+            self._stale.update(failed)
+
+    async def rebuild(self, db: AsyncSession, story_id: int):
+        is_published = (await db.execute(
+            select(Story.is_published).filter(Story.story_id == story_id)
+        )).scalar_one_or_none()
+
+        rows: List[dict] = []
+        if is_published:
+            nodes, choices = await load_story_structure_async(db, story_id)
+            rows = await run_in_threadpool(compute_story_hints, story_id, nodes, choices)
+
+        await db.execute(delete(NodeHint).where(NodeHint.story_id == story_id))
+        for start in range(0, len(rows), HINT_INSERT_BATCH):
+            await db.execute(insert(NodeHint), rows[start:start + HINT_INSERT_BATCH])
+        await db.commit()
+
+
+hint_indexer = register_flusher(HintIndexer(AsyncSessionLocal, interval=settings.HINT_REBUILD_INTERVAL, cache=cache))
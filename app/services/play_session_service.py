@@ -0,0 +1,65 @@
+import time
+from typing import Dict, Optional, Tuple
+
+from app.services.stats_service import StatsAggregator, stats_aggregator
+from app.utils.flushers import BackgroundFlusher, register_flusher
+from config import settings
+
+
+class PlaySessionTracker(BackgroundFlusher):
+    """
+    Turns client heartbeats into `stats.total_play_time`.
+
+    A heartbeat only records when the (user, story) pair was last seen and
+    adds the gap since the previous one, if it is within `idle_timeout`, to
+    the user's unreported seconds. Nothing is written per heartbeat: every
+    `interval` seconds whole minutes are handed to the stats aggregator,
+    which folds them into its batched UPSERT. Once a session goes idle its
+    leftover seconds are rounded to the nearest minute.
+    """
+
+    def __init__(self, stats: StatsAggregator, interval: float, idle_timeout: float):
+        super().__init__(interval)
+        self.stats = stats
+        self.idle_timeout = idle_timeout
+        self._last_seen: Dict[Tuple[int, int], float] = {}  # (user_id, story_id) -> monotonic time
+        self._seconds: Dict[int, float] = {}                 # user_id -> active seconds not yet reported
+
+    def heartbeat(self, user_id: int, story_id: int, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        key = (user_id, story_id)
+        last = self._last_seen.get(key)
+        self._last_seen[key] = now
+        if last is not None and now - last <= self.idle_timeout:
+            self._seconds[user_id] = self._seconds.get(user_id, 0.0) + (now - last)
+
+    async def flush(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        for key, last in list(self._last_seen.items()):
+            if now - last > self.idle_timeout:
+                del self._last_seen[key]
+        active_users = {user_id for user_id, _ in self._last_seen}
+
+        for user_id, seconds in list(self._seconds.items()):
+            minutes, remainder = divmod(seconds, 60)
+            if user_id not in active_users:
+                minutes += remainder >= 30
+                remainder = 0.0
+            if minutes:
+                self.stats.record_play_time(user_id, int(minutes))
+            if remainder:
+                self._seconds[user_id] = remainder
+            else:
+                del self._seconds[user_id]
+
+    async def stop(self):
+        # Every session ends with the process, so report the leftovers too
+        self._last_seen.clear()
+        await super().stop()
+
+
+play_sessions = register_flusher(PlaySessionTracker(
+    stats_aggregator,
+    interval=settings.PLAY_SESSION_FLUSH_INTERVAL,
+    idle_timeout=settings.PLAY_SESSION_IDLE_TIMEOUT
+))
@@ -0,0 +1,186 @@
+import math
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from app.models.story import Story
+from app.models.story_popularity import StoryPopularity
+from app.utils.flushers import BackgroundFlusher, register_flusher
+from config import settings
+
+# Scores are log(sum of weight * 2 ** ((event time - LANDMARK) / half_life))
+LANDMARK = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+TRENDING_HALF_LIFE = settings.TRENDING_HALF_LIFE_HOURS * 3600
+POPULAR_HALF_LIFE = settings.POPULAR_HALF_LIFE_DAYS * 86400
+
+RANKINGS = {
+    "trending": (StoryPopularity.trending_score, TRENDING_HALF_LIFE),
+    "popular": (StoryPopularity.popular_score, POPULAR_HALF_LIFE),
+}
+
+
+def _log_weight(weight: float, at: datetime, half_life: float) -> float:
+    return math.log(weight) + (at - LANDMARK).total_seconds() * math.log(2) / half_life
+
+
+def _log_add(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without overflow"""
+    if a == -math.inf:
+        return b
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
+
+
+def _sql_log_add(a, b):
+    return func.greatest(a, b) + func.ln(1 + func.exp(-func.abs(a - b)))
+
+
+def decayed_score(log_score: float, half_life: float, now: Optional[datetime] = None) -> float:
+    """A stored score as the weighted event count, decayed to `now`"""
+    now = now or datetime.now(timezone.utc)
+    return math.exp(log_score - (now - LANDMARK).total_seconds() * math.log(2) / half_life)
+
+
+@dataclass
+class PendingPopularity:
+    """Events of one story not yet written"""
+    plays: int = 0
+    completions: int = 0
+    trending: float = -math.inf
+    popular: float = -math.inf
+
+
+class PopularityCounters(BackgroundFlusher):
+    """
+    Time-decayed play and completion counters per story.
+
+    The game engine reports plays (story starts) and completions here.
+    Each event's weight is added to two exponentially decayed scores with
+    different half-lives, trending and popular. Because scores are kept as
+    logarithms relative to LANDMARK, adding an event is a log-sum-exp and
+    decay never has to be applied to stored rows: every `interval` seconds
+    the pending increments are merged with one UPSERT, and the indexed
+    score columns are the ranking.
+    """
+
+    def __init__(self, session_factory, interval: float, completion_weight: float):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.completion_weight = completion_weight
+        self._pending: Dict[int, PendingPopularity] = {}
+
+    def _add(self, story_id: int, weight: float) -> PendingPopularity:
+        pending = self._pending.get(story_id)
+        if pending is None:
+            pending = self._pending[story_id] = PendingPopularity()
+        now = datetime.now(timezone.utc)
+        pending.trending = _log_add(pending.trending, _log_weight(weight, now, TRENDING_HALF_LIFE))
+        pending.popular = _log_add(pending.popular, _log_weight(weight, now, POPULAR_HALF_LIFE))
+        return pending
+
+    def record_play(self, story_id: int):
+        self._add(story_id, 1.0).plays += 1
+
+    def record_completion(self, story_id: int):
+        self._add(story_id, self.completion_weight).completions += 1
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        try:
+            async with self.session_factory() as db:
+                await self._apply(db, batch)
+                await db.commit()
+        except Exception:
+            for story_id, pending in batch.items():
+                current = self._pending.setdefault(story_id, PendingPopularity())
+                current.plays += pending.plays
+                current.completions += pending.completions
+                current.trending = _log_add(current.trending, pending.trending)
+                current.popular = _log_add(current.popular, pending.popular)
+            raise
+
+    async def _apply(self, db: AsyncSession, batch: Dict[int, PendingPopularity]):
+        # Events of stories deleted since they were played have nowhere to go; drop them
+        existing = set((await db.execute(
+            select(Story.story_id).filter(Story.story_id.in_(sorted(batch)))
+        )).scalars().all())
+        batch = {story_id: pending for story_id, pending in batch.items() if story_id in existing}
+        if not batch:
+            return
+
+        stmt = pg_insert(StoryPopularity).values([
+            {
+                "story_id": story_id,
+                "plays": pending.plays,
+                "completions": pending.completions,
+                "trending_score": pending.trending,
+                "popular_score": pending.popular
+            }
+            for story_id, pending in sorted(batch.items())
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[StoryPopularity.story_id],
+            set_={
+                "plays": StoryPopularity.plays + stmt.excluded.plays,
+                "completions": StoryPopularity.completions + stmt.excluded.completions,
+                "trending_score": _sql_log_add(StoryPopularity.trending_score, stmt.excluded.trending_score),
+                "popular_score": _sql_log_add(StoryPopularity.popular_score, stmt.excluded.popular_score),
+                "updated_at": func.now()
+            }
+        ))
+
+
+def parse_ranking_cursor(cursor: str) -> Tuple[float, int]:
+    score, story_id = cursor.rsplit("_", 1)
+    return float(score), int(story_id)
+
+
+def ranked_stories(
+    db: Session,
+    ranking: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Tuple[Story, StoryPopularity]], Optional[str]]:
+    """
+    One page of published stories by a ranking, highest first, and the cursor of the next page.
+
+    A keyset walk down the ranking's score index, so a page costs
+    O(limit) however many stories there are. Raises ValueError on a bad cursor.
+    """
+    score_column, _ = RANKINGS[ranking]
+    query = select(Story, StoryPopularity).join(
+        StoryPopularity, StoryPopularity.story_id == Story.story_id
+    ).filter(Story.is_published == True)
+    if cursor:
+        score, story_id = parse_ranking_cursor(cursor)
+        query = query.filter(or_(
+            score_column < score,
+            and_(score_column == score, StoryPopularity.story_id < story_id)
+        ))
+    rows = db.execute(
+        query.order_by(score_column.desc(), StoryPopularity.story_id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][1]
+        next_cursor = f"{getattr(last, score_column.key)!r}_{last.story_id}"
+    return rows, next_cursor
+
+
+popularity_counters = register_flusher(PopularityCounters(
+    AsyncSessionLocal,
+    interval=settings.POPULARITY_FLUSH_INTERVAL,
+    completion_weight=settings.POPULARITY_COMPLETION_WEIGHT
+))
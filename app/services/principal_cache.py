@@ -0,0 +1,129 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+
+from app.models.user import User
+from config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """A verified caller: the token's claims and the user fields routes read, detached from any session"""
+    user_id: int
+    username: str
+    email: str
+    created_at: datetime
+    last_active: datetime
+    claims: Dict[str, Any] = field(default_factory=dict, compare=False)
+
+    @classmethod
+    def from_user(cls, user: User, claims: Dict[str, Any]) -> "Principal":
+        return cls(
+            user_id=user.user_id,
+            username=user.username,
+            email=user.email,
+            created_at=user.created_at,
+            last_active=user.last_active,
+            claims=claims
+        )
+
+
+@dataclass(frozen=True)
+class TokenPrincipal:
+    """A caller known only from a verified access token's claims; no users row is read to build it"""
+    user_id: int
+    claims: Dict[str, Any] = field(default_factory=dict, compare=False)
+
+
+class PrincipalCache:
+    """
+    Verified principals by token digest, LRU-bounded with a TTL.
+
+    An entry lives for `ttl` seconds or until its token expires, whichever
+    is sooner, so a hit needs neither the JWT decode nor the users lookup.
+    Entries are also indexed by user_id so `invalidate_user()` can drop
+    every token of a user whose account was deleted or whose credentials
+    changed. The cache is per process; the TTL bounds how long another
+    worker can keep serving a principal after such a change.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[Principal, float]]" = OrderedDict()
+        self._by_user: Dict[int, Set[bytes]] = {}
+        self._lock = Lock()    # get_current_user is sync and runs on worker threads
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, digest: bytes) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(digest)
+                return None
+            self._entries.move_to_end(digest)
+            return principal
+
+    def put(self, digest: bytes, principal: Principal, token_expires_at: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._remove(digest)
+            self._entries[digest] = (principal, expires_at)
+            self._by_user.setdefault(principal.user_id, set()).add(digest)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._remove(digest)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, digest: bytes):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._by_user.get(entry[0].user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[entry[0].user_id]
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+# Fields a cached principal depends on; changing any of them logs the user's tokens out of the cache
+_PRINCIPAL_FIELDS = ("username", "email", "password_hash")
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _PRINCIPAL_FIELDS):
+        principal_cache.invalidate_user(target.user_id)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User):
+    principal_cache.invalidate_user(target.user_id)
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.user_progress import UserProgress
+from app.utils.flushers import BackgroundFlusher, RowsNotWritten, register_flusher, write_isolating_bad_rows
+from config import settings
+
+DURABILITY_SYNC = "sync"
+DURABILITY_BUFFERED = "buffered"
+
+
+@dataclass
+class PendingProgress:
+    """Latest known position of one (user_id, story_id) that is not yet written"""
+    current_node_id: int
+    is_completed: bool
+
+
+class ProgressStore(BackgroundFlusher):
+    """
+    Write-behind store for user progress.
+
+    In "sync" mode every save is upserted and committed on the request's
+    session. In "buffered" mode saves are coalesced per (user_id, story_id)
+    in memory and written as one batched UPSERT every `interval` seconds,
+    when `max_pending` keys are buffered, or on shutdown.
+    """
+
+    def __init__(self, session_factory, durability: str, interval: float, max_pending: int):
+        super().__init__(interval)
+        if durability not in (DURABILITY_SYNC, DURABILITY_BUFFERED):
+            raise ValueError(f"Unknown progress durability mode: {durability}")
+        self.session_factory = session_factory
+        self.durability = durability
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[int, int], PendingProgress] = {}
+
+    async def save(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        story_id: int,
+        node_id: int,
+        is_completed: bool = False
+    ) -> bool:
+        """Record a user's new position; returns True once the write is accepted"""
+        if self.durability == DURABILITY_SYNC:
+            await self._upsert(db, [(user_id, story_id, PendingProgress(node_id, is_completed))])
+            await db.commit()
+            return True
+
+        key = (user_id, story_id)
+        self._pending[key] = PendingProgress(node_id, is_completed)
+
+        if len(self._pending) >= self.max_pending:
+            self.request_flush()
+        return True
+
+    def get_pending(self, user_id: int, story_id: int) -> Optional[PendingProgress]:
+        """Buffered position for a user, so reads can see their own unflushed writes"""
+        return self._pending.get((user_id, story_id))
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        rows = [(user_id, story_id, pending) for (user_id, story_id), pending in batch.items()]
+        try:
+            await write_isolating_bad_rows(self.session_factory, rows, self._upsert, "progress")
+        except RowsNotWritten as error:
+            # Put the unwritten rows back underneath anything buffered while we were flushing
+            for user_id, story_id, pending in error.rows:
+                self._pending.setdefault((user_id, story_id), pending)
+            raise
+
+    async def _upsert(self, db: AsyncSession, rows: List[Tuple[int, int, PendingProgress]]):
+        stmt = pg_insert(UserProgress).values([
+            {
+                "user_id": user_id,
+                "story_id": story_id,
+                "current_node_id": pending.current_node_id,
+                "is_completed": pending.is_completed
+            }
+            for user_id, story_id, pending in rows
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserProgress.user_id, UserProgress.story_id],
+            set_={
+                "current_node_id": stmt.excluded.current_node_id,
+                "is_completed": stmt.excluded.is_completed,
+                "last_updated": func.now()
+            }
+        ))
+
+
+progress_store = register_flusher(ProgressStore(
+    AsyncSessionLocal,
+    durability=settings.PROGRESS_DURABILITY,
+    interval=settings.PROGRESS_FLUSH_INTERVAL,
+    max_pending=settings.PROGRESS_FLUSH_MAX_PENDING
+))
@@ -0,0 +1,136 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import AsyncSessionLocal
+from app.models.player_sketch import PlayerSketch
+from app.utils.flushers import BackgroundFlusher, register_flusher
+from app.utils.hyperloglog import HyperLogLog
+from config import settings
+
+# node_id of the story-wide sketch, and day of the all-time sketch
+STORY_WIDE = 0
+LIFETIME_DAY = date(1970, 1, 1)
+
+# Rows per INSERT when new sketches are claimed
+SKETCH_INSERT_BATCH = 1000
+
+# story_id, node_id, day
+SketchKey = Tuple[int, int, date]
+
+
+class PlayerSketchStore(BackgroundFlusher):
+    """
+    Distinct players per story and node, per day and all-time.
+
+    `record()` adds the player to in-memory HyperLogLog sketches for today
+    and for all time, story-wide and for each node reached. Every
+    `interval` seconds the sketches are merged into player_sketches: keys
+    nobody has written yet are claimed with INSERT .. ON CONFLICT DO NOTHING,
+    the rest are locked, merged register-wise and updated, in key order so
+    workers flushing at the same time cannot deadlock or lose each
+    other's players. Queries union at most PLAYER_SKETCH_MAX_DAYS rows.
+    """
+
+    def __init__(self, session_factory, interval: float, precision: int):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self.precision = precision
+        self._pending: Dict[SketchKey, HyperLogLog] = {}
+
+    def _sketch(self, key: SketchKey) -> HyperLogLog:
+        sketch = self._pending.get(key)
+        if sketch is None:
+            sketch = self._pending[key] = HyperLogLog(self.precision)
+        return sketch
+
+    def record(self, user_id: int, story_id: int, node_ids: Iterable[int]):
+        """Note that a player reached `node_ids` of a story"""
+        hashed = HyperLogLog.hash_value(user_id)
+        today = datetime.now(timezone.utc).date()
+        for node_id in (STORY_WIDE, *node_ids):
+            self._sketch((story_id, node_id, today)).add_hash(hashed)
+            self._sketch((story_id, node_id, LIFETIME_DAY)).add_hash(hashed)
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        try:
+            async with self.session_factory() as db:
+                await self._merge(db, batch)
+                await db.commit()
+        except Exception:
+            for key, sketch in batch.items():
+                self._sketch(key).update(sketch)
+            raise
+
+    async def _merge(self, db: AsyncSession, batch: Dict[SketchKey, HyperLogLog]):
+        keys = sorted(batch)
+        key_columns = (PlayerSketch.story_id, PlayerSketch.node_id, PlayerSketch.day)
+
+        claimed = set()
+        for start in range(0, len(keys), SKETCH_INSERT_BATCH):
+            chunk = keys[start:start + SKETCH_INSERT_BATCH]
+            result = await db.execute(
+                pg_insert(PlayerSketch).values([
+                    {"story_id": key[0], "node_id": key[1], "day": key[2], "sketch": batch[key].to_bytes()}
+                    for key in chunk
+                ]).on_conflict_do_nothing().returning(*key_columns)
+            )
+            claimed.update(tuple(row) for row in result.all())
+
+        existing = [key for key in keys if key not in claimed]
+        for start in range(0, len(existing), SKETCH_INSERT_BATCH):
+            rows = (await db.execute(
+                select(PlayerSketch)
+                .filter(tuple_(*key_columns).in_(existing[start:start + SKETCH_INSERT_BATCH]))
+                .order_by(*key_columns)
+                .with_for_update()
+            )).scalars().all()
+            for row in rows:
+                merged = HyperLogLog.from_bytes(row.sketch)
+                merged.update(batch[(row.story_id, row.node_id, row.day)])
+                row.sketch = merged.to_bytes()
+
+    async def unique_players(
+        self,
+        db: AsyncSession,
+        story_id: int,
+        node_id: int = STORY_WIDE,
+        days: Optional[int] = None
+    ) -> HyperLogLog:
+        """Union of the sketches for the last `days` days (today included), or all time when None"""
+        if days is None:
+            window: List[date] = [LIFETIME_DAY]
+        else:
+            today = datetime.now(timezone.utc).date()
+            window = [today - timedelta(days=offset) for offset in range(days)]
+
+        stored = (await db.execute(
+            select(PlayerSketch.sketch).filter(
+                PlayerSketch.story_id == story_id,
+                PlayerSketch.node_id == node_id,
+                PlayerSketch.day.in_(window)
+            )
+        )).scalars().all()
+
+        sketches = [HyperLogLog.from_bytes(data) for data in stored]
+        # Players this worker has not flushed yet
+        sketches.extend(
+            self._pending[(story_id, node_id, day)]
+            for day in window if (story_id, node_id, day) in self._pending
+        )
+        return HyperLogLog.union(sketches, self.precision)
+
+
+player_sketches = register_flusher(PlayerSketchStore(
+    AsyncSessionLocal,
+    interval=settings.PLAYER_SKETCH_FLUSH_INTERVAL,
+    precision=settings.PLAYER_SKETCH_PRECISION
+))
@@ -0,0 +1,131 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import AsyncSessionLocal
+from app.models.user import UserStats, UserCategoryStats
+from app.utils.flushers import BackgroundFlusher, RowsNotWritten, register_flusher, write_isolating_bad_rows
+from config import settings
+
+
+@dataclass
+class PendingStats:
+    """Increments for one user's stats row that are not yet written"""
+    total_choices_made: int = 0
+    stories_completed: int = 0
+    total_play_time: int = 0  # minutes
+
+
+# user_id, increments, completions per category
+StatsRow = Tuple[int, PendingStats, Dict[str, int]]
+
+
+class StatsAggregator(BackgroundFlusher):
+    """
+    Maintains `stats` rows off the request path.
+
+    The game engine reports choices and completions, and the play session
+    tracker reports minutes played; they are summed
+    per user in memory and applied every `interval` seconds as set-based
+    increments: one UPSERT for `stats`, one for per-category completion
+    counts, and one UPDATE deriving `favorite_category` from those counts.
+    """
+
+    def __init__(self, session_factory, interval: float):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self._pending: Dict[int, PendingStats] = {}
+        self._category_completions: Counter = Counter()  # (user_id, category) -> completions
+
+    def _for(self, user_id: int) -> PendingStats:
+        pending = self._pending.get(user_id)
+        if pending is None:
+            pending = self._pending[user_id] = PendingStats()
+        return pending
+
+    def record_choices(self, user_id: int, count: int = 1):
+        self._for(user_id).total_choices_made += count
+
+    def record_completion(self, user_id: int, category: Optional[str]):
+        self._for(user_id).stories_completed += 1
+        if category:
+            self._category_completions[(user_id, category)] += 1
+
+    def record_play_time(self, user_id: int, minutes: int):
+        self._for(user_id).total_play_time += minutes
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        categories, self._category_completions = self._category_completions, Counter()
+        by_user: Dict[int, Dict[str, int]] = {}
+        for (user_id, category), count in categories.items():
+            by_user.setdefault(user_id, {})[category] = count
+        rows = [(user_id, pending, by_user.get(user_id, {})) for user_id, pending in batch.items()]
+        try:
+            await write_isolating_bad_rows(self.session_factory, rows, self._apply, "stats")
+        except RowsNotWritten as error:
+            # Fold the unwritten rows back into whatever accumulated while we were flushing
+            for user_id, pending, user_categories in error.rows:
+                current = self._for(user_id)
+                current.total_choices_made += pending.total_choices_made
+                current.stories_completed += pending.stories_completed
+                current.total_play_time += pending.total_play_time
+                for category, count in user_categories.items():
+                    self._category_completions[(user_id, category)] += count
+            raise
+
+    async def _apply(self, db: AsyncSession, rows: List[StatsRow]):
+        stmt = pg_insert(UserStats).values([
+            {
+                "user_id": user_id,
+                "stories_completed": pending.stories_completed,
+                "total_choices_made": pending.total_choices_made,
+                "favorite_category": "",
+                "total_play_time": pending.total_play_time
+            }
+            for user_id, pending, _ in rows
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={
+                "stories_completed": func.coalesce(UserStats.stories_completed, 0) + stmt.excluded.stories_completed,
+                "total_choices_made": func.coalesce(UserStats.total_choices_made, 0) + stmt.excluded.total_choices_made,
+                "total_play_time": func.coalesce(UserStats.total_play_time, 0) + stmt.excluded.total_play_time
+            }
+        ))
+
+        categories = [
+            {"user_id": user_id, "category": category, "stories_completed": count}
+            for user_id, _, user_categories in rows
+            for category, count in user_categories.items()
+        ]
+        if not categories:
+            return
+
+        stmt = pg_insert(UserCategoryStats).values(categories)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserCategoryStats.user_id, UserCategoryStats.category],
+            set_={"stories_completed": UserCategoryStats.stories_completed + stmt.excluded.stories_completed}
+        ))
+
+        favorite = select(UserCategoryStats.category).filter(
+            UserCategoryStats.user_id == UserStats.user_id
+        ).order_by(
+            UserCategoryStats.stories_completed.desc(), UserCategoryStats.category
+        ).limit(1).scalar_subquery()
+        await db.execute(
+            update(UserStats)
+            .where(UserStats.user_id.in_(sorted({row["user_id"] for row in categories})))
+            .values(favorite_category=favorite)
+        )
+
+
+stats_aggregator = register_flusher(StatsAggregator(AsyncSessionLocal, interval=settings.STATS_FLUSH_INTERVAL))
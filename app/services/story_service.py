@@ -1 +1,325 @@
-  
\ No newline at end of file
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.story import Story, StoryNode
+from app.models.choice import Choice
+from app.utils.json_response import dumps_bytes
+from config import settings
+
+
+@dataclass(frozen=True)
+class CompiledChoice:
+    choice_id: int
+    from_node_id: int
+    to_node_id: int
+    choice_text: str
+    choice_letter: str
+    consequences: Optional[str]
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    node_id: int
+    story_id: int
+    node_title: str
+    content: str
+    is_starting_node: bool
+    is_ending_node: bool
+    node_type: str
+    choices: Tuple[CompiledChoice, ...]  # ordered by choice_letter
+
+
+def encode_node(node, choices) -> bytes:
+    """NodeResponse JSON for a node-like and its choice-likes (compiled or ORM rows), choices in order"""
+    return dumps_bytes({
+        "node_id": node.node_id,
+        "node_title": node.node_title,
+        "content": node.content,
+        "is_starting_node": node.is_starting_node,
+        "is_ending_node": node.is_ending_node,
+        "node_type": node.node_type,
+        "choices": [
+            {
+                "choice_id": choice.choice_id,
+                "choice_text": choice.choice_text,
+                "choice_letter": choice.choice_letter,
+                "consequences": choice.consequences
+            }
+            for choice in choices
+        ]
+    })
+
+
+class StoryGraph:
+    """Read-only, compiled view of one story used by the game engine"""
+
+    def __init__(
+        self,
+        story_id: int,
+        is_published: bool,
+        category: Optional[str],
+        nodes: Dict[int, CompiledNode],
+        start_node_id: Optional[int]
+    ):
+        self.story_id = story_id
+        self.is_published = is_published
+        self.category = category
+        self.nodes = nodes
+        self.start_node_id = start_node_id
+        self.choices: Dict[int, CompiledChoice] = {
+            choice.choice_id: choice
+            for node in nodes.values()
+            for choice in node.choices
+        }
+        # Content digest, identical in every worker for the same story contents
+        self.version = hashlib.blake2b(
+            repr((is_published, sorted(nodes.items()))).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        self._encoded_nodes: Dict[int, bytes] = {}
+        self._encoded_choices: Dict[int, bytes] = {}
+
+    @property
+    def start_node(self) -> Optional[CompiledNode]:
+        if self.start_node_id is None:
+            return None
+        return self.nodes.get(self.start_node_id)
+
+    def get_node(self, node_id: int) -> Optional[CompiledNode]:
+        return self.nodes.get(node_id)
+
+    def get_choice(self, choice_id: int) -> Optional[CompiledChoice]:
+        return self.choices.get(choice_id)
+
+    def encoded_node(self, node_id: int) -> bytes:
+        """NodeResponse JSON for a node, encoded once per graph version"""
+        encoded = self._encoded_nodes.get(node_id)
+        if encoded is None:
+            node = self.nodes[node_id]
+            encoded = encode_node(node, node.choices)
+            self._encoded_nodes[node_id] = encoded
+        return encoded
+
+    def encoded_choice_result(self, choice_id: int, next_node: Optional[bytes] = None) -> bytes:
+        """
+        ChoiceResponse JSON for taking a choice, without the per-request fields.
+
+        `next_node` replaces the encoded destination node (e.g. with live
+        stats spliced in); such results are not cached.
+        """
+        encoded = self._encoded_choices.get(choice_id) if next_node is None else None
+        if encoded is None:
+            choice = self.choices[choice_id]
+            destination = self.nodes[choice.to_node_id]
+            encoded = (
+                b'{"success":true,"next_node":' + (next_node or self.encoded_node(destination.node_id))
+                + b',"consequences":' + dumps_bytes(choice.consequences)
+                + b',"is_ending":' + dumps_bytes(destination.is_ending_node)
+                + b'}'
+            )
+            if next_node is None:
+                self._encoded_choices[choice_id] = encoded
+        return encoded
+
+
+def compile_story_graph(story: Story, nodes, choices) -> StoryGraph:
+    """Build a StoryGraph from a story row and its node / choice rows"""
+    outgoing: Dict[int, list] = {}
+    for choice in choices:
+        outgoing.setdefault(choice.from_node_id, []).append(
+            CompiledChoice(
+                choice_id=choice.choice_id,
+                from_node_id=choice.from_node_id,
+                to_node_id=choice.to_node_id,
+                choice_text=choice.choice_text,
+                choice_letter=choice.choice_letter,
+                consequences=choice.consequences
+            )
+        )
+
+    compiled_nodes: Dict[int, CompiledNode] = {}
+    start_node_id = None
+    for node in nodes:
+        node_choices = sorted(outgoing.get(node.node_id, []), key=lambda c: c.choice_letter)
+        compiled_nodes[node.node_id] = CompiledNode(
+            node_id=node.node_id,
+            story_id=node.story_id,
+            node_title=node.node_title,
+            content=node.content,
+            is_starting_node=node.is_starting_node,
+            is_ending_node=node.is_ending_node,
+            node_type=node.node_type,
+            choices=tuple(node_choices)
+        )
+        if node.is_starting_node and start_node_id is None:
+            start_node_id = node.node_id
+
+    return StoryGraph(
+        story_id=story.story_id,
+        is_published=story.is_published,
+        category=story.category,
+        nodes=compiled_nodes,
+        start_node_id=start_node_id
+    )
+
+
+def _story_graph_rows(story_filter):
+    """Story -> its nodes -> their choices, as one outer-joined statement"""
+    return select(Story, StoryNode, Choice).outerjoin(
+        StoryNode, StoryNode.story_id == Story.story_id
+    ).outerjoin(
+        Choice, Choice.from_node_id == StoryNode.node_id
+    ).filter(story_filter).order_by(StoryNode.node_id)
+
+
+def _story_of_node(node_id: int):
+    owner = aliased(StoryNode)
+    return Story.story_id == select(owner.story_id).filter(owner.node_id == node_id).scalar_subquery()
+
+
+def _compile_rows(rows) -> Optional[StoryGraph]:
+    if not rows:
+        return None
+    nodes = {}
+    choices = []
+    for _, node, choice in rows:
+        if node is not None:
+            nodes[node.node_id] = node
+        if choice is not None:
+            choices.append(choice)
+    return compile_story_graph(rows[0][0], nodes.values(), choices)
+
+
+async def load_story_graph_async(db: AsyncSession, story_id: int) -> Optional[StoryGraph]:
+    """Load and compile a story graph straight from the database in one statement"""
+    return _compile_rows((await db.execute(_story_graph_rows(Story.story_id == story_id))).all())
+
+
+async def load_story_graph_for_node_async(db: AsyncSession, node_id: int) -> Optional[StoryGraph]:
+    """Load the graph of the story owning `node_id`, resolving the story in the same statement"""
+    return _compile_rows((await db.execute(_story_graph_rows(_story_of_node(node_id)))).all())
+
+
+class StoryGraphCache:
+    """
+    Bounded LRU of compiled story graphs, keyed by story_id.
+
+    Graphs are immutable once compiled; authoring routes call `invalidate`
+    after every mutation so the next read recompiles the story. Graphs
+    older than `max_age` seconds are recompiled so edits served by other
+    worker processes are picked up.
+    """
+
+    def __init__(self, max_size: int, max_age: float):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._graphs: "OrderedDict[int, Tuple[StoryGraph, float]]" = OrderedDict()  # story_id -> (graph, compiled at)
+        self._node_index: Dict[int, int] = {}  # node_id -> story_id for cached graphs
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0  # bumped by every invalidation, for loads that start without a story_id
+        self._lock = Lock()
+
+    def get(self, story_id: int) -> Optional[StoryGraph]:
+        with self._lock:
+            entry = self._graphs.get(story_id)
+            if entry is None:
+                return None
+            graph, compiled_at = entry
+            if time.monotonic() - compiled_at > self.max_age:
+                self._drop(story_id)
+                return None
+            self._graphs.move_to_end(story_id)
+            return graph
+
+    def story_id_for_node(self, node_id: int) -> Optional[int]:
+        with self._lock:
+            return self._node_index.get(node_id)
+
+    def generation(self, story_id: int) -> int:
+        with self._lock:
+            return self._generations.get(story_id, 0)
+
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def put(self, graph: StoryGraph, generation: Optional[int] = None, epoch: Optional[int] = None):
+        """Store a graph unless the story (or, given an epoch, any story) was invalidated while it was loading"""
+        with self._lock:
+            if generation is not None and self._generations.get(graph.story_id, 0) != generation:
+                return
+            if epoch is not None and self._epoch != epoch:
+                return
+            self._drop(graph.story_id)
+            self._graphs[graph.story_id] = (graph, time.monotonic())
+            for node_id in graph.nodes:
+                self._node_index[node_id] = graph.story_id
+            while len(self._graphs) > self.max_size:
+                oldest_story_id = next(iter(self._graphs))
+                self._drop(oldest_story_id)
+
+    def invalidate(self, story_id: int):
+        with self._lock:
+            self._generations[story_id] = self._generations.get(story_id, 0) + 1
+            self._epoch += 1
+            self._drop(story_id)
+
+    def clear(self):
+        with self._lock:
+            for story_id in list(self._graphs):
+                self._generations[story_id] = self._generations.get(story_id, 0) + 1
+                self._drop(story_id)
+            self._epoch += 1
+
+    def _drop(self, story_id: int):
+        entry = self._graphs.pop(story_id, None)
+        if entry is None:
+            return
+        graph, _ = entry
+        for node_id in graph.nodes:
+            if self._node_index.get(node_id) == story_id:
+                del self._node_index[node_id]
+
+
+story_graph_cache = StoryGraphCache(settings.STORY_GRAPH_CACHE_SIZE, settings.STORY_GRAPH_MAX_AGE)
+
+
+async def get_story_graph_async(db: AsyncSession, story_id: int) -> Optional[StoryGraph]:
+    """Return the compiled graph for a story, loading it on a cache miss"""
+    graph = story_graph_cache.get(story_id)
+    if graph is not None:
+        return graph
+
+    generation = story_graph_cache.generation(story_id)
+    graph = await load_story_graph_async(db, story_id)
+    if graph is not None:
+        story_graph_cache.put(graph, generation)
+    return graph
+
+
+async def get_story_graph_for_node_async(db: AsyncSession, node_id: int) -> Optional[StoryGraph]:
+    """Return the compiled graph of the story that owns `node_id`"""
+    story_id = story_graph_cache.story_id_for_node(node_id)
+    if story_id is not None:
+        graph = await get_story_graph_async(db, story_id)
+    else:
+        epoch = story_graph_cache.epoch()
+        graph = await load_story_graph_for_node_async(db, node_id)
+        if graph is not None:
+            story_graph_cache.put(graph, epoch=epoch)
+
+    if graph is None or node_id not in graph.nodes:
+        return None
+    return graph
+
+
+def invalidate_story_graph(story_id: int):
+    """Drop the cached graph for a story after it has been edited"""
+    story_graph_cache.invalidate(story_id)
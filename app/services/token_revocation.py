@@ -0,0 +1,89 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import AsyncSessionLocal
+from app.models.revoked_token import RevokedToken
+from app.utils.flushers import BackgroundFlusher, register_flusher
+from config import settings
+
+# Re-read revocations this far behind the last sync, to catch rows committed late by other workers
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class RevocationStore(BackgroundFlusher):
+    """
+    Revoked refresh-token ids, checked from memory.
+
+    `is_revoked()` is a dict lookup. `revoke()` takes effect in this worker
+    at once and is written to revoked_tokens on the next pass, which also
+    pulls revocations made by other workers since the previous pass and
+    forgets entries whose tokens have expired anyway, so the set only ever
+    holds ids of still-valid tokens.
+    """
+
+    def __init__(self, session_factory, interval: float):
+        super().__init__(interval)
+        self.session_factory = session_factory
+        self._revoked: Dict[str, float] = {}           # token id -> expiry (epoch seconds)
+        self._pending: List[Tuple[str, float]] = []
+        self._synced_at: Optional[datetime] = None
+
+    def is_revoked(self, *token_ids: Optional[str]) -> bool:
+        return any(token_id in self._revoked for token_id in token_ids if token_id)
+
+    def revoke(self, token_id: str, expires_at: float):
+        if expires_at <= time.time():
+            return
+        self._revoked[token_id] = expires_at
+        self._pending.append((token_id, expires_at))
+        self.request_flush()
+
+    async def start(self):
+        # Load what is already revoked before serving refreshes
+        await self._safe_flush()
+        await super().start()
+
+    async def flush(self):
+        batch, self._pending = self._pending, []
+        started = datetime.now(timezone.utc)
+        try:
+            async with self.session_factory() as db:
+                if batch:
+                    await self._write(db, batch)
+                await self._pull(db)
+                await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= started))
+                await db.commit()
+        except Exception:
+            self._pending = batch + self._pending
+            raise
+        self._synced_at = started
+
+        now = time.time()
+        for token_id in [token_id for token_id, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[token_id]
+
+    async def _write(self, db: AsyncSession, batch: List[Tuple[str, float]]):
+        await db.execute(pg_insert(RevokedToken).values([
+            {"token_id": token_id, "expires_at": datetime.fromtimestamp(expires_at, timezone.utc)}
+            for token_id, expires_at in batch
+        ]).on_conflict_do_nothing())
+
+    async def _pull(self, db: AsyncSession):
+        query = select(RevokedToken.token_id, RevokedToken.expires_at).filter(
+            RevokedToken.expires_at > datetime.now(timezone.utc)
+        )
+        if self._synced_at is not None:
+            query = query.filter(RevokedToken.revoked_at >= self._synced_at - SYNC_OVERLAP)
+        for token_id, expires_at in (await db.execute(query)).all():
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            self._revoked[token_id] = expires_at.timestamp()
+
+
+revocation_store = register_flusher(RevocationStore(AsyncSessionLocal, interval=settings.TOKEN_REVOCATION_SYNC_INTERVAL))
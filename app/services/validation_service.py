@@ -0,0 +1,259 @@
+from collections import Counter
+from itertools import accumulate, compress
+from operator import eq, gt
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.story import StoryNode
+from app.models.choice import Choice
+from app.schemas.engine_schemas import ValidationResult
+
+# Column-only rows, so validation never materialises ORM objects
+NodeRow = Tuple[int, bool, bool]            # node_id, is_starting_node, is_ending_node
+ChoiceRow = Tuple[int, int, int, str]       # choice_id, from_node_id, to_node_id, choice_letter
+
+# Longest id list spelled out inside an issue message; full lists are in the result fields
+MAX_IDS_IN_ISSUE = 20
+
+# bytearray.translate table flipping 0/1 flags
+_INVERT = bytes([1, 0]) + bytes(254)
+
+
+def _node_columns(story_id: int):
+    return select(
+        StoryNode.node_id, StoryNode.is_starting_node, StoryNode.is_ending_node
+    ).filter(StoryNode.story_id == story_id)
+
+
+def _choice_columns(story_id: int):
+    return select(
+        Choice.choice_id, Choice.from_node_id, Choice.to_node_id, Choice.choice_letter
+    ).join(
+        StoryNode, Choice.from_node_id == StoryNode.node_id
+    ).filter(StoryNode.story_id == story_id)
+
+
+def load_story_structure(db: Session, story_id: int) -> Tuple[List[NodeRow], List[ChoiceRow]]:
+    """Fetch the node flags and choice edges of a story as plain tuples"""
+    nodes = db.execute(_node_columns(story_id)).all()
+    choices = db.execute(_choice_columns(story_id)).all()
+    return nodes, choices
+
+
+async def load_story_structure_async(db: AsyncSession, story_id: int) -> Tuple[List[NodeRow], List[ChoiceRow]]:
+    """Async counterpart of `load_story_structure`"""
+    nodes = (await db.execute(_node_columns(story_id))).all()
+    choices = (await db.execute(_choice_columns(story_id))).all()
+    return nodes, choices
+
+
+def _build_csr(node_count: int, sources: List[int], targets: List[int]) -> Tuple[List[int], List[int]]:
+    """Compressed adjacency: neighbours of i are adjacency[offsets[i]:offsets[i + 1]]"""
+    counts = [0] * (node_count + 1)
+    for source in sources:
+        counts[source + 1] += 1
+    offsets = list(accumulate(counts))
+
+    fill = offsets[:-1]
+    adjacency = [0] * len(targets)
+    for source, target in zip(sources, targets):
+        adjacency[fill[source]] = target
+        fill[source] += 1
+    return offsets, adjacency
+
+
+def _mark_from(seeds: Sequence[int], node_count: int, offsets: List[int], adjacency: List[int]) -> bytearray:
+    """Flag every node reachable from `seeds`"""
+    marked = bytearray(node_count)
+    stack = []
+    for seed in seeds:
+        if not marked[seed]:
+            marked[seed] = 1
+            stack.append(seed)
+    while stack:
+        current = stack.pop()
+        for neighbour in adjacency[offsets[current]:offsets[current + 1]]:
+            if not marked[neighbour]:
+                marked[neighbour] = 1
+                stack.append(neighbour)
+    return marked
+
+
+def _cycles_within(include: bytearray, offsets: List[int], adjacency: List[int]) -> List[List[int]]:
+    """Cyclic strongly connected components of the subgraph flagged by `include` (iterative Tarjan)"""
+    node_count = len(include)
+    order = [-1] * node_count
+    low = [0] * node_count
+    on_stack = bytearray(node_count)
+    stack: List[int] = []
+    cycles: List[List[int]] = []
+    counter = 0
+
+    for root in range(node_count):
+        if not include[root] or order[root] != -1:
+            continue
+
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, offsets[root])]
+
+        while work:
+            current, position = work[-1]
+            end = offsets[current + 1]
+            descended = False
+            while position < end:
+                neighbour = adjacency[position]
+                position += 1
+                if not include[neighbour]:
+                    continue
+                if order[neighbour] == -1:
+                    work[-1] = (current, position)
+                    order[neighbour] = low[neighbour] = counter
+                    counter += 1
+                    stack.append(neighbour)
+                    on_stack[neighbour] = 1
+                    work.append((neighbour, offsets[neighbour]))
+                    descended = True
+                    break
+                if on_stack[neighbour] and order[neighbour] < low[current]:
+                    low[current] = order[neighbour]
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[current] < low[parent]:
+                    low[parent] = low[current]
+
+            if low[current] == order[current]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component.append(member)
+                    if member == current:
+                        break
+                self_loop = current in adjacency[offsets[current]:offsets[current + 1]]
+                if len(component) > 1 or self_loop:
+                    cycles.append(component)
+
+    return cycles
+
+
+def _format_ids(ids: List[int]) -> str:
+    if len(ids) <= MAX_IDS_IN_ISSUE:
+        return str(ids)
+    return f"{ids[:MAX_IDS_IN_ISSUE]} ... ({len(ids)} total)"
+
+
+def analyze_story_structure(nodes: Sequence[NodeRow], choices: Sequence[ChoiceRow]) -> ValidationResult:
+    """
+    Validate a story graph in O(V + E).
+
+    Reports missing / multiple starting nodes, missing endings, unreachable
+    nodes, dead ends, nodes that cannot reach any ending, cycles with no
+    exit to an ending, choices leading outside the story and duplicate
+    choice letters.
+    """
+    if not nodes:
+        return ValidationResult(
+            is_valid=False,
+            issues=["Story has no nodes"],
+            total_nodes=0,
+            total_choices=len(choices)
+        )
+
+    issues: List[str] = []
+
+    # Dense indices keep every per-node structure a flat array; the per-row
+    # passes below go through map/zip/Counter so they run at C speed
+    node_ids, starting_flags, ending_flags = (list(column) for column in zip(*nodes))
+    node_count = len(node_ids)
+    index_of: Dict[int, int] = dict(zip(node_ids, range(node_count)))
+    starts = list(compress(range(node_count), starting_flags))
+    endings = list(compress(range(node_count), ending_flags))
+
+    if len(starts) == 0:
+        issues.append("Story has no starting node")
+    elif len(starts) > 1:
+        issues.append("Story has multiple starting nodes")
+
+    if len(endings) == 0:
+        issues.append("Story has no ending nodes")
+
+    if choices:
+        choice_ids, from_node_ids, to_node_ids, choice_letters = zip(*choices)
+    else:
+        choice_ids = from_node_ids = to_node_ids = choice_letters = ()
+
+    sources = list(map(index_of.__getitem__, from_node_ids))
+    targets = list(map(index_of.get, to_node_ids))
+    outside_story: List[int] = []
+    if None in targets:
+        outside_story = [choice_id for choice_id, target in zip(choice_ids, targets) if target is None]
+        kept = [(source, target) for source, target in zip(sources, targets) if target is not None]
+        sources = [source for source, _ in kept]
+        targets = [target for _, target in kept]
+
+    # Letter conflicts: a (node, letter) pair used by more than one choice
+    letter_counts = Counter(zip(from_node_ids, choice_letters))
+    conflicted = [key for key, count in letter_counts.items() if count > 1]
+
+    forward_offsets, forward = _build_csr(node_count, sources, targets)
+    reverse_offsets, reverse = _build_csr(node_count, targets, sources)
+
+    reachable = _mark_from(starts, node_count, forward_offsets, forward)
+    reaches_ending = _mark_from(endings, node_count, reverse_offsets, reverse)
+
+    no_choices = map(eq, forward_offsets[:-1], forward_offsets[1:])
+    dead_end_flags = bytearray(map(gt, no_choices, ending_flags))
+    trapped = reaches_ending.translate(_INVERT) if endings else bytearray(node_count)
+
+    unreachable_nodes = list(compress(node_ids, reachable.translate(_INVERT))) if starts else []
+    dead_ends = list(compress(node_ids, dead_end_flags))
+    cannot_reach_ending = list(compress(node_ids, map(gt, trapped, dead_end_flags)))
+
+    # Only nodes that cannot reach an ending can sit on a cycle with no exit
+    cycles_without_exit = [
+        sorted(node_ids[index] for index in component)
+        for component in _cycles_within(trapped, forward_offsets, forward)
+    ]
+    cycles_without_exit.sort()
+
+    if unreachable_nodes:
+        issues.append(f"Unreachable nodes found: {_format_ids(unreachable_nodes)}")
+
+    if dead_ends:
+        issues.append(f"Dead end nodes found: {_format_ids(dead_ends)}")
+
+    if cannot_reach_ending:
+        issues.append(f"Nodes that cannot reach any ending: {_format_ids(cannot_reach_ending)}")
+
+    for cycle in cycles_without_exit[:MAX_IDS_IN_ISSUE]:
+        issues.append(f"Cycle with no exit to an ending: {_format_ids(cycle)}")
+    if len(cycles_without_exit) > MAX_IDS_IN_ISSUE:
+        issues.append(f"... {len(cycles_without_exit) - MAX_IDS_IN_ISSUE} more cycles with no exit")
+
+    if outside_story:
+        issues.append(f"Choices leading outside the story: {_format_ids(outside_story)}")
+
+    for from_node_id, letter in conflicted:
+        issues.append(f"Node {from_node_id} has duplicate choice letter '{letter}'")
+
+    return ValidationResult(
+        is_valid=len(issues) == 0,
+        issues=issues,
+        total_nodes=node_count,
+        total_choices=len(choices),
+        unreachable_nodes=unreachable_nodes,
+        dead_ends=dead_ends,
+        cannot_reach_ending=cannot_reach_ending,
+        cycles_without_exit=cycles_without_exit,
+        letter_conflicts=sorted({from_node_id for from_node_id, _ in conflicted})
+    )
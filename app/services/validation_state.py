@@ -0,0 +1,448 @@
+import time
+from collections import Counter, OrderedDict, deque
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.schemas.engine_schemas import ValidationResult
+from app.services.validation_service import (
+    MAX_IDS_IN_ISSUE, NodeRow, ChoiceRow, _format_ids, load_story_structure
+)
+from config import settings
+
+
+class _IncrementalReach:
+    """
+    Set of nodes reachable from `roots`, kept current under edge and root edits.
+
+    Additions expand from the new edge or root. Removals over-delete the
+    region that was reachable through the removed support, then re-derive
+    it from region nodes that still have a marked predecessor or are roots,
+    so work is proportional to the affected region, not the story.
+    """
+
+    def __init__(self, successors: Callable[[int], Iterable[int]], predecessors: Callable[[int], Iterable[int]]):
+        self.successors = successors
+        self.predecessors = predecessors
+        self.roots: Set[int] = set()
+        self.marked: Set[int] = set()
+        self.unmarked: Set[int] = set()
+
+    def add_node(self, node_id: int):
+        self.unmarked.add(node_id)
+
+    def remove_node(self, node_id: int):
+        self.roots.discard(node_id)
+        self.marked.discard(node_id)
+        self.unmarked.discard(node_id)
+
+    def add_root(self, node_id: int):
+        self.roots.add(node_id)
+        self._expand([node_id])
+
+    def remove_root(self, node_id: int):
+        if node_id in self.roots:
+            self.roots.discard(node_id)
+            self._shrink(node_id)
+
+    def edge_added(self, source: int, target: int):
+        if source in self.marked and target not in self.marked:
+            self._expand([target])
+
+    def edge_removed(self, source: int, target: int):
+        """Call after the edge is gone from the adjacency"""
+        if source in self.marked and target in self.marked:
+            self._shrink(target)
+
+    def _expand(self, seeds: Iterable[int]):
+        queue = deque()
+        for seed in seeds:
+            if seed in self.unmarked:
+                self.unmarked.discard(seed)
+                self.marked.add(seed)
+                queue.append(seed)
+        while queue:
+            current = queue.popleft()
+            for neighbour in self.successors(current):
+                if neighbour in self.unmarked:
+                    self.unmarked.discard(neighbour)
+                    self.marked.add(neighbour)
+                    queue.append(neighbour)
+
+    def _shrink(self, start: int):
+        if start in self.roots:
+            return
+        # Over-delete everything that may only have been marked through `start`
+        region = {start}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            for neighbour in self.successors(current):
+                if neighbour in self.marked and neighbour not in region:
+                    region.add(neighbour)
+                    queue.append(neighbour)
+        self.marked -= region
+        self.unmarked |= region
+
+        # Re-derive from whatever in the region is still supported from outside it
+        self._expand(
+            node_id for node_id in region
+            if node_id in self.roots or any(p in self.marked for p in self.predecessors(node_id))
+        )
+
+
+class StoryValidationState:
+    """
+    Validation state of one story, updated edit by edit.
+
+    Issue sets are maintained incrementally, so `is_valid` is O(1) and
+    `result()` costs O(number of reported issues). Cycles with no exit are
+    the one derived value; they are recomputed over the (usually tiny) set
+    of nodes that cannot reach an ending, and only after an edit touched it.
+    """
+
+    def __init__(self, story_id: int, nodes: Iterable[NodeRow], choices: Iterable[ChoiceRow]):
+        self.story_id = story_id
+        self.built_at = time.monotonic()
+        self.lock = Lock()
+
+        self.nodes: Dict[int, Tuple[bool, bool]] = {}
+        self.choices: Dict[int, Tuple[int, int, str]] = {}
+        self.outgoing: Dict[int, Dict[int, int]] = {}   # node_id -> {choice_id: to_node_id}
+        self.incoming: Dict[int, Dict[int, int]] = {}   # node_id -> {choice_id: from_node_id}
+        self.outside_story: Set[int] = set()
+        self.letter_counts: Counter = Counter()
+        self.conflicted: Set[Tuple[int, str]] = set()
+        self.starts: Set[int] = set()
+        self.endings: Set[int] = set()
+        self.dead_ends: Set[int] = set()
+
+        self.reachable = _IncrementalReach(self._successors, self._predecessors)
+        self.reaches_ending = _IncrementalReach(self._predecessors, self._successors)
+        self._cycles: Optional[List[List[int]]] = None
+
+        for node_id, is_starting_node, is_ending_node in nodes:
+            self.nodes[node_id] = (is_starting_node, is_ending_node)
+            self.outgoing[node_id] = {}
+            self.incoming[node_id] = {}
+            self.reachable.add_node(node_id)
+            self.reaches_ending.add_node(node_id)
+            if is_starting_node:
+                self.starts.add(node_id)
+            if is_ending_node:
+                self.endings.add(node_id)
+
+        for choice_id, from_node_id, to_node_id, choice_letter in choices:
+            self._link(choice_id, from_node_id, to_node_id, choice_letter)
+
+        for node_id in self.nodes:
+            self._refresh_dead_end(node_id)
+
+        # One full pass to seed both reachability sets
+        for node_id in self.starts:
+            self.reachable.add_root(node_id)
+        for node_id in self.endings:
+            self.reaches_ending.add_root(node_id)
+
+    def _successors(self, node_id: int) -> Iterable[int]:
+        return self.outgoing.get(node_id, {}).values()
+
+    def _predecessors(self, node_id: int) -> Iterable[int]:
+        return self.incoming.get(node_id, {}).values()
+
+    def _link(self, choice_id: int, from_node_id: int, to_node_id: int, choice_letter: str):
+        self.choices[choice_id] = (from_node_id, to_node_id, choice_letter)
+        key = (from_node_id, choice_letter)
+        self.letter_counts[key] += 1
+        if self.letter_counts[key] > 1:
+            self.conflicted.add(key)
+        if to_node_id not in self.nodes or from_node_id not in self.nodes:
+            self.outside_story.add(choice_id)
+            return
+        self.outgoing[from_node_id][choice_id] = to_node_id
+        self.incoming[to_node_id][choice_id] = from_node_id
+
+    def _unlink(self, choice_id: int) -> Tuple[int, int, str]:
+        from_node_id, to_node_id, choice_letter = self.choices.pop(choice_id)
+        key = (from_node_id, choice_letter)
+        self.letter_counts[key] -= 1
+        if self.letter_counts[key] <= 1:
+            self.conflicted.discard(key)
+        if self.letter_counts[key] <= 0:
+            del self.letter_counts[key]
+        if choice_id in self.outside_story:
+            self.outside_story.discard(choice_id)
+        else:
+            self.outgoing[from_node_id].pop(choice_id, None)
+            self.incoming[to_node_id].pop(choice_id, None)
+        return from_node_id, to_node_id, choice_letter
+
+    def _refresh_dead_end(self, node_id: int):
+        if node_id in self.nodes and not self.outgoing[node_id] and node_id not in self.endings:
+            self.dead_ends.add(node_id)
+        else:
+            self.dead_ends.discard(node_id)
+
+    # Edit events -----------------------------------------------------------
+
+    def node_created(self, node_id: int, is_starting_node: bool, is_ending_node: bool):
+        self.nodes[node_id] = (False, False)
+        self.outgoing[node_id] = {}
+        self.incoming[node_id] = {}
+        self.reachable.add_node(node_id)
+        self.reaches_ending.add_node(node_id)
+        self.node_updated(node_id, is_starting_node, is_ending_node)
+
+    def node_updated(self, node_id: int, is_starting_node: bool, is_ending_node: bool):
+        was_start, was_end = self.nodes[node_id]
+        self.nodes[node_id] = (is_starting_node, is_ending_node)
+
+        if is_starting_node and not was_start:
+            self.starts.add(node_id)
+            self.reachable.add_root(node_id)
+        elif was_start and not is_starting_node:
+            self.starts.discard(node_id)
+            self.reachable.remove_root(node_id)
+
+        if is_ending_node and not was_end:
+            self.endings.add(node_id)
+            self.reaches_ending.add_root(node_id)
+        elif was_end and not is_ending_node:
+            self.endings.discard(node_id)
+            self.reaches_ending.remove_root(node_id)
+
+        self._refresh_dead_end(node_id)
+        self._cycles = None
+
+    def node_deleted(self, node_id: int):
+        # Nodes can only be deleted once they have no choices in or out
+        if node_id not in self.nodes:
+            return
+        self.node_updated(node_id, False, False)
+        del self.nodes[node_id]
+        del self.outgoing[node_id]
+        del self.incoming[node_id]
+        self.reachable.remove_node(node_id)
+        self.reaches_ending.remove_node(node_id)
+        self.dead_ends.discard(node_id)
+
+    def choice_created(self, choice_id: int, from_node_id: int, to_node_id: int, choice_letter: str):
+        self._link(choice_id, from_node_id, to_node_id, choice_letter)
+        if choice_id not in self.outside_story:
+            self.reachable.edge_added(from_node_id, to_node_id)
+            self.reaches_ending.edge_added(to_node_id, from_node_id)
+        self._refresh_dead_end(from_node_id)
+        self._cycles = None
+
+    def choice_deleted(self, choice_id: int):
+        if choice_id not in self.choices:
+            return
+        was_outside = choice_id in self.outside_story
+        from_node_id, to_node_id, _ = self._unlink(choice_id)
+        if not was_outside:
+            self.reachable.edge_removed(from_node_id, to_node_id)
+            self.reaches_ending.edge_removed(to_node_id, from_node_id)
+        self._refresh_dead_end(from_node_id)
+        self._cycles = None
+
+    def choice_updated(self, choice_id: int, to_node_id: int, choice_letter: str):
+        if choice_id not in self.choices:
+            return
+        from_node_id = self.choices[choice_id][0]
+        self.choice_deleted(choice_id)
+        self.choice_created(choice_id, from_node_id, to_node_id, choice_letter)
+
+    # Reads -----------------------------------------------------------------
+
+    def _trapped(self) -> Set[int]:
+        """Nodes (other than dead ends) that cannot reach any ending"""
+        if not self.endings:
+            return set()
+        return self.reaches_ending.unmarked - self.dead_ends
+
+    @property
+    def is_valid(self) -> bool:
+        return bool(
+            self.nodes
+            and len(self.starts) == 1
+            and self.endings
+            and not self.reachable.unmarked
+            and not self.dead_ends
+            and not self.reaches_ending.unmarked
+            and not self.outside_story
+            and not self.conflicted
+        )
+
+    def cycles_without_exit(self) -> List[List[int]]:
+        if self._cycles is None:
+            trapped = self.reaches_ending.unmarked if self.endings else set()
+            self._cycles = _cycles_in(trapped, self._successors)
+        return self._cycles
+
+    def result(self) -> ValidationResult:
+        if not self.nodes:
+            return ValidationResult(
+                is_valid=False,
+                issues=["Story has no nodes"],
+                total_nodes=0,
+                total_choices=len(self.choices)
+            )
+
+        issues: List[str] = []
+        if len(self.starts) == 0:
+            issues.append("Story has no starting node")
+        elif len(self.starts) > 1:
+            issues.append("Story has multiple starting nodes")
+        if not self.endings:
+            issues.append("Story has no ending nodes")
+
+        unreachable_nodes = sorted(self.reachable.unmarked) if self.starts else []
+        dead_ends = sorted(self.dead_ends)
+        cannot_reach_ending = sorted(self._trapped())
+        cycles_without_exit = self.cycles_without_exit()
+
+        if unreachable_nodes:
+            issues.append(f"Unreachable nodes found: {_format_ids(unreachable_nodes)}")
+        if dead_ends:
+            issues.append(f"Dead end nodes found: {_format_ids(dead_ends)}")
+        if cannot_reach_ending:
+            issues.append(f"Nodes that cannot reach any ending: {_format_ids(cannot_reach_ending)}")
+        for cycle in cycles_without_exit[:MAX_IDS_IN_ISSUE]:
+            issues.append(f"Cycle with no exit to an ending: {_format_ids(cycle)}")
+        if len(cycles_without_exit) > MAX_IDS_IN_ISSUE:
+            issues.append(f"... {len(cycles_without_exit) - MAX_IDS_IN_ISSUE} more cycles with no exit")
+        if self.outside_story:
+            issues.append(f"Choices leading outside the story: {_format_ids(sorted(self.outside_story))}")
+        for from_node_id, letter in sorted(self.conflicted):
+            issues.append(f"Node {from_node_id} has duplicate choice letter '{letter}'")
+
+        return ValidationResult(
+            is_valid=len(issues) == 0,
+            issues=issues,
+            total_nodes=len(self.nodes),
+            total_choices=len(self.choices),
+            unreachable_nodes=unreachable_nodes,
+            dead_ends=dead_ends,
+            cannot_reach_ending=cannot_reach_ending,
+            cycles_without_exit=cycles_without_exit,
+            letter_conflicts=sorted({from_node_id for from_node_id, _ in self.conflicted})
+        )
+
+
+def _cycles_in(include: Set[int], successors: Callable[[int], Iterable[int]]) -> List[List[int]]:
+    """Cyclic strongly connected components of the subgraph induced by `include`"""
+    order: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    on_stack: Set[int] = set()
+    stack: List[int] = []
+    cycles: List[List[int]] = []
+
+    for root in include:
+        if root in order:
+            continue
+        order[root] = low[root] = len(order)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(list(successors(root))))]
+        while work:
+            current, neighbours = work[-1]
+            descended = False
+            for neighbour in neighbours:
+                if neighbour not in include:
+                    continue
+                if neighbour not in order:
+                    order[neighbour] = low[neighbour] = len(order)
+                    stack.append(neighbour)
+                    on_stack.add(neighbour)
+                    work.append((neighbour, iter(list(successors(neighbour)))))
+                    descended = True
+                    break
+                if neighbour in on_stack:
+                    low[current] = min(low[current], order[neighbour])
+            if descended:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[current])
+            if low[current] == order[current]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == current:
+                        break
+                if len(component) > 1 or current in successors(current):
+                    cycles.append(sorted(component))
+
+    return sorted(cycles)
+
+
+class ValidationStateRegistry:
+    """
+    Per-process LRU of StoryValidationState, keyed by story_id.
+
+    Authoring routes report each edit; stories that are not loaded simply
+    ignore edits and are built from the database on their next read. States
+    older than `max_age` seconds are rebuilt so edits served by other worker
+    processes are picked up.
+    """
+
+    def __init__(self, max_size: int, max_age: float):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._states: "OrderedDict[int, StoryValidationState]" = OrderedDict()
+        self._edit_counts: Dict[int, int] = {}
+        self._lock = Lock()
+
+    def _get_loaded(self, story_id: int) -> Optional[StoryValidationState]:
+        with self._lock:
+            state = self._states.get(story_id)
+            if state is not None:
+                self._states.move_to_end(story_id)
+            return state
+
+    def get(self, db: Session, story_id: int) -> StoryValidationState:
+        state = self._get_loaded(story_id)
+        if state is not None and time.monotonic() - state.built_at <= self.max_age:
+            return state
+
+        with self._lock:
+            edits_before = self._edit_counts.get(story_id, 0)
+        nodes, choices = load_story_structure(db, story_id)
+        state = StoryValidationState(story_id, nodes, choices)
+        with self._lock:
+            # An edit that raced the load may be missing from it; serve it once, don't keep it
+            if self._edit_counts.get(story_id, 0) == edits_before:
+                self._states[story_id] = state
+                self._states.move_to_end(story_id)
+                while len(self._states) > self.max_size:
+                    self._states.popitem(last=False)
+        return state
+
+    def result(self, db: Session, story_id: int) -> ValidationResult:
+        state = self.get(db, story_id)
+        with state.lock:
+            return state.result()
+
+    def apply(self, story_id: int, event: str, *args):
+        """Apply an edit event (a StoryValidationState method name) if the story is loaded"""
+        with self._lock:
+            self._edit_counts[story_id] = self._edit_counts.get(story_id, 0) + 1
+        state = self._get_loaded(story_id)
+        if state is None:
+            return
+        with state.lock:
+            getattr(state, event)(*args)
+
+    def discard(self, story_id: int):
+        with self._lock:
+            self._states.pop(story_id, None)
+
+
+validation_states = ValidationStateRegistry(
+    settings.VALIDATION_STATE_CACHE_SIZE,
+    settings.VALIDATION_STATE_MAX_AGE
+)
@@ -0,0 +1,246 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from functools import partial
+from typing import Dict, Iterable, Optional, Set
+
+from anyio import from_thread
+from fastapi import Depends
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # optional: only needed for CACHE_BACKEND=redis
+    redis_asyncio = None
+
+from config import settings
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_ratio": self.hit_ratio}
+
+
+class CacheBackend(ABC):
+    """
+    Async byte cache shared by routes and services.
+
+    Values are encoded bytes (usually response JSON), so every backend can
+    store them as-is. Entries expire after `ttl` seconds and can carry tags;
+    `invalidate_tags` drops every entry carrying any of the given tags.
+    """
+
+    def __init__(self, default_ttl: Optional[float]):
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, *tags: str):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU bounded to `max_entries`, with per-entry TTL.
+
+    All calls happen on the event loop (sync routes reach it through
+    `anyio.from_thread.run`), so no locking is needed.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: Optional[float] = None):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires at or None, tags)
+        self._tags: Dict[str, Set[str]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        tags = tuple(tags)
+
+        self._remove(key)
+        self._entries[key] = (value, expires_at, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        self.stats.sets += 1
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    async def delete(self, key: str):
+        self._remove(key)
+
+    async def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._remove(key)
+                self.stats.invalidations += 1
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared by every worker, on Redis or anything speaking its API.
+
+    `client` is a `redis.asyncio` client; tests can pass a local stand-in
+    with the same methods. Tags are Redis sets of member keys. Size-bounded
+    eviction is delegated to the server (maxmemory with an allkeys-lru
+    policy), and hit/miss stats are counted per worker.
+    """
+
+    def __init__(self, client, namespace: str, default_ttl: Optional[float] = None):
+        super().__init__(default_ttl)
+        self.client = client
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:k:{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.namespace}:t:{tag}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self.client.get(self._key(key))
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        ttl = self.default_ttl if ttl is None else ttl
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self._key(key), value, px=int(ttl * 1000) if ttl else None)
+            for tag in tags:
+                pipe.sadd(self._tag(tag), key)
+            await pipe.execute()
+        self.stats.sets += 1
+
+    async def delete(self, key: str):
+        await self.client.delete(self._key(key))
+
+    async def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            keys = await self.client.smembers(self._tag(tag))
+            members = [self._key(key.decode() if isinstance(key, bytes) else key) for key in keys]
+            await self.client.delete(*members, self._tag(tag))
+            self.stats.invalidations += len(members)
+
+    async def clear(self):
+        async for key in self.client.scan_iter(match=f"{self.namespace}:*"):
+            await self.client.delete(key)
+
+
+def create_cache_backend() -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(settings.CACHE_MAX_ENTRIES, settings.CACHE_DEFAULT_TTL)
+    if settings.CACHE_BACKEND == "redis":
+        if redis_asyncio is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        return RedisCacheBackend(
+            redis_asyncio.from_url(settings.CACHE_URL),
+            namespace=settings.CACHE_NAMESPACE,
+            default_ttl=settings.CACHE_DEFAULT_TTL
+        )
+    raise ValueError(f"Unknown cache backend: {settings.CACHE_BACKEND}")
+
+
+cache = create_cache_backend()
+
+
+class BlockingCache:
+    """Blocking view of a CacheBackend for sync routes, which run on worker threads"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[bytes]:
+        return from_thread.run(self.backend.get, key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        from_thread.run(partial(self.backend.set, key, value, ttl, tuple(tags)))
+
+    def invalidate_tags(self, *tags: str):
+        from_thread.run(partial(self.backend.invalidate_tags, *tags))
+
+
+def get_cache() -> CacheBackend:
+    """FastAPI dependency; override it to give routes a different backend"""
+    return cache
+
+
+async def get_blocking_cache(backend: CacheBackend = Depends(get_cache)) -> BlockingCache:
+    return BlockingCache(backend)
+
+
+# Tag names, so every route invalidates the same way
+def story_tag(story_id: int) -> str:
+    return f"story:{story_id}"
+
+
+def hints_tag(story_id: int) -> str:
+    return f"hints:{story_id}"
+
+
+STORY_LIST_TAG = "stories"
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+Row = TypeVar("Row")
+
+# Errors caused by the rows themselves (a deleted user or story, a value out of range); anything else is retried later
+ROW_ERRORS = (IntegrityError, DataError)
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFlusher(ABC):
+    """
+    Base class for in-memory write buffers that are drained to the database
+    by a background task.
+
+    Subclasses implement `flush()`. The loop runs it every `interval` seconds,
+    or earlier when `request_flush()` is called (e.g. a size threshold was hit),
+    and `stop()` runs a final flush so nothing buffered is lost on shutdown.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @abstractmethod
+    async def flush(self):
+        ...
+
+    def request_flush(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await self._safe_flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._safe_flush()
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("%s flush failed", type(self).__name__)
+
+
+class RowsNotWritten(Exception):
+    """Raised by `write_isolating_bad_rows` with the rows it could not write, for the caller to buffer again"""
+
+    def __init__(self, rows: list):
+        super().__init__(f"{len(rows)} rows not written")
+        self.rows = rows
+
+
+async def write_isolating_bad_rows(
+    session_factory,
+    rows: Sequence[Row],
+    write: Callable[..., Awaitable[None]],
+    label: str
+):
+    """
+    Write `rows` with `write(db, rows)` in one transaction.
+
+    If the batch is rejected by a constraint, the rows are retried one per
+    transaction and those still rejected are logged and dropped, so one bad
+    row cannot block every later flush. Any other error raises
+    RowsNotWritten with the rows not yet committed.
+    """
+    try:
+        async with session_factory() as db:
+            await write(db, rows)
+            await db.commit()
+        return
+    except ROW_ERRORS:
+        if len(rows) == 1:
+            logger.exception("Dropping %s row %r", label, rows[0])
+            return
+    except Exception as error:
+        raise RowsNotWritten(list(rows)) from error
+
+    for index, row in enumerate(rows):
+        try:
+            async with session_factory() as db:
+                await write(db, [row])
+                await db.commit()
+        except ROW_ERRORS:
+            logger.exception("Dropping %s row %r", label, row)
+        except Exception as error:
+            raise RowsNotWritten(list(rows[index:])) from error
+
+
+_flushers: List[BackgroundFlusher] = []
+
+
+def register_flusher(flusher: BackgroundFlusher) -> BackgroundFlusher:
+    """Register a flusher so it is started and drained with the application"""
+    _flushers.append(flusher)
+    return flusher
+
+
+async def start_flushers():
+    for flusher in _flushers:
+        await flusher.start()
+
+
+async def stop_flushers():
+    # Newest first: later flushers may hand their data to earlier ones on the way out
+    for flusher in reversed(_flushers):
+        await flusher.stop()
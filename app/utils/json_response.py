@@ -0,0 +1,40 @@
+import json
+from functools import lru_cache
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """Compact JSON encoding used for pre-serialized response fragments"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _adapter(model_type) -> TypeAdapter:
+    return TypeAdapter(model_type)
+
+
+def dumps_model(model_type, value: Any) -> bytes:
+    """Encode ORM objects (or lists of them) exactly as `response_model=model_type` would"""
+    adapter = _adapter(model_type)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def splice_fields(document: bytes, **fields: Any) -> bytes:
+    """Append top-level fields to an already encoded JSON object"""
+    if not fields:
+        return document
+    extra = b"".join(
+        b',"' + name.encode("utf-8") + b'":' + dumps_bytes(value)
+        for name, value in fields.items()
+    )
+    if document == b"{}":
+        return b"{" + extra[1:] + b"}"
+    return document[:-1] + extra + b"}"
+
+
+class RawJSONResponse(Response):
+    """Response for bodies that are already encoded JSON bytes"""
+    media_type = "application/json"
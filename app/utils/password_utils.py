@@ -1 +1,122 @@
- 
\ No newline at end of file
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config import settings
+
+# password hashing setup; hashes made with another cost are upgraded on the next successful login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+
+# Run inside the pool's worker processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+def _verify_and_update(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+class PasswordPoolFull(Exception):
+    """Raised instead of queueing when the password pool's backlog is at its limit"""
+
+
+@dataclass
+class PasswordPoolStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0
+    in_flight: int = 0
+    busy_seconds: float = 0.0  # summed wall time of finished jobs, queueing included
+
+    def as_dict(self, max_workers: int, max_pending: int) -> dict:
+        running = min(self.in_flight, max_workers)
+        finished = self.completed + self.failed
+        return {
+            **asdict(self),
+            "max_workers": max_workers,
+            "max_pending": max_pending,
+            "running": running,
+            "queued": self.in_flight - running,
+            "utilisation": running / max_workers if max_workers else 0.0,
+            "average_seconds": self.busy_seconds / finished if finished else 0.0
+        }
+
+
+class PasswordPool:
+    """
+    Runs passlib hashing and verification in a dedicated process pool.
+
+    bcrypt holds the CPU for hundreds of milliseconds, so doing it on the
+    event loop or a threadpool slot stalls everything else the worker is
+    serving. At most `max_workers` jobs run at once and at most
+    `max_pending` more wait; past that `PasswordPoolFull` is raised so the
+    caller can shed load instead of building an unbounded queue. The pool
+    is created on first use and uses spawned processes, which are safe to
+    start from a running event loop.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stats = PasswordPoolStats()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, function, *args):
+        if self.stats.in_flight >= self.max_workers + self.max_pending:
+            self.stats.rejected += 1
+            raise PasswordPoolFull()
+
+        self.stats.submitted += 1
+        self.stats.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool(), function, *args)
+        except Exception:
+            self.stats.failed += 1
+            raise
+        else:
+            self.stats.completed += 1
+            return result
+        finally:
+            self.stats.in_flight -= 1
+            self.stats.busy_seconds += time.monotonic() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(_verify, password, password_hash)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Verify, and if the hash uses outdated parameters also return a fresh hash, in one job"""
+        return await self._run(_verify_and_update, password, password_hash)
+
+    def metrics(self) -> dict:
+        return self.stats.as_dict(self.max_workers, self.max_pending)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordPool(settings.PASSWORD_POOL_WORKERS, settings.PASSWORD_POOL_MAX_PENDING)
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """SQL statements executed while a `count_queries()` block was active"""
+
+    def __init__(self, operation: Optional[str] = None):
+        self.operation = operation
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __repr__(self):
+        return f"QueryCounter(operation={self.operation!r}, count={self.count})"
+
+
+_active_counters: ContextVar[tuple] = ContextVar("active_query_counters", default=())
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in _active_counters.get():
+        counter.statements.append(statement)
+
+
+@contextmanager
+def count_queries(operation: Optional[str] = None) -> Iterator[QueryCounter]:
+    """
+    Count the statements the current task sends to the database.
+
+        with count_queries("make_choice") as queries:
+            await engine.make_choice(request)
+        assert queries.count == 1
+
+    Counting is per context (task or thread), so concurrent requests don't
+    bleed into each other, and blocks can be nested.
+    """
+    counter = QueryCounter(operation)
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
@@ -0,0 +1,67 @@
+import logging
+from dataclasses import dataclass
+from typing import Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Serialises upgrades when several workers start at once
+UPGRADE_LOCK_ID = 727_001
+
+
+@dataclass(frozen=True)
+class UniqueKey:
+    """
+    A unique constraint that upserts rely on and `create_all` will not add to an existing table.
+
+    Duplicate rows are removed before the constraint is added; of each
+    group the row sorting last by `keep_last_by` is kept.
+    """
+    table: str
+    name: str
+    columns: Tuple[str, ...]
+    keep_last_by: Tuple[str, ...]
+
+
+UNIQUE_KEYS = (
+    UniqueKey("user_progress", "uq_user_progress_user_story", ("user_id", "story_id"), ("last_updated", "progress_id")),
+    UniqueKey("stats", "uq_stats_user", ("user_id",), ("stat_id",)),
+)
+
+# Columns added after their table was first created: (table, column, definition)
+ADDED_COLUMNS = (
+    ("users", "password_version", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def _has_constraint(connection: Connection, key: UniqueKey) -> bool:
+    return any(constraint["name"] == key.name for constraint in inspect(connection).get_unique_constraints(key.table))
+
+
+def _add_unique_key(connection: Connection, key: UniqueKey):
+    same_key = " AND ".join(f"a.{column} = b.{column}" for column in key.columns)
+    a_order = ", ".join(f"a.{column}" for column in key.keep_last_by)
+    b_order = ", ".join(f"b.{column}" for column in key.keep_last_by)
+    removed = connection.execute(text(
+        f"DELETE FROM {key.table} a USING {key.table} b "
+        f"WHERE {same_key} AND ({a_order}) < ({b_order})"
+    )).rowcount
+    connection.execute(text(
+        f"ALTER TABLE {key.table} ADD CONSTRAINT {key.name} UNIQUE ({', '.join(key.columns)})"
+    ))
+    logger.info("Added %s to %s after removing %s duplicate rows", key.name, key.table, removed)
+
+
+def upgrade_schema(engine: Engine):
+    """Bring tables created by an earlier version up to the current models; safe to run on every start"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": UPGRADE_LOCK_ID})
+        for table, column, definition in ADDED_COLUMNS:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}"))
+        for key in UNIQUE_KEYS:
+            if not _has_constraint(connection, key):
+                _add_unique_key(connection, key)
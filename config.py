@@ -149,6 +149,18 @@ class Config:
     ALGORITHM = os.getenv('ALGORITHM', 'HS256')
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES', '30'))
     REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv('REFRESH_TOKEN_EXPIRE_DAYS', '7'))
+    # bcrypt cost factor; lowering or raising it rehashes each user's password at their next login
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    # bcrypt runs in a process pool; requests beyond workers + max pending get a 503
+    PASSWORD_POOL_WORKERS = int(os.getenv('PASSWORD_POOL_WORKERS', '2'))
+    PASSWORD_POOL_MAX_PENDING = int(os.getenv('PASSWORD_POOL_MAX_PENDING', '32'))
+    # Each worker pulls refresh-token revocations made by other workers this often
+    TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', '5.0'))
+    # Verified principals are cached per process, keyed by token digest
+    PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', '10000'))
+    PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', '60'))
+    # Usernames allowed to use the /admin operator endpoints, comma-separated
+    OPERATOR_USERNAMES = frozenset(name.strip() for name in os.getenv('OPERATOR_USERNAMES', '').split(',') if name.strip())
     
     # API Configuration
     API_V1_STR = "/api/v1"
@@ -161,6 +173,63 @@ class Config:
     DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '20'))
     MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '100'))
 
+    # Game Engine
+    STORY_GRAPH_CACHE_SIZE = int(os.getenv('STORY_GRAPH_CACHE_SIZE', '256'))
+    STORY_GRAPH_MAX_AGE = float(os.getenv('STORY_GRAPH_MAX_AGE', '60'))  # seconds before a worker recompiles a graph edited elsewhere
+    LOOKAHEAD_MAX_DEPTH = int(os.getenv('LOOKAHEAD_MAX_DEPTH', '3'))
+    GAME_STATE_MAX_HISTORY = int(os.getenv('GAME_STATE_MAX_HISTORY', '1000'))  # choices kept in a state token
+    IN_PROGRESS_PAGE_SIZE = int(os.getenv('IN_PROGRESS_PAGE_SIZE', '20'))
+
+    # Response cache: "memory" (per process) or "redis" (shared by all workers)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_URL = os.getenv('CACHE_URL', 'redis://localhost:6379/0')
+    CACHE_NAMESPACE = os.getenv('CACHE_NAMESPACE', 'story-game')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+    CACHE_DEFAULT_TTL = float(os.getenv('CACHE_DEFAULT_TTL', '300'))
+
+    # Incremental validation state for the story editor
+    VALIDATION_STATE_CACHE_SIZE = int(os.getenv('VALIDATION_STATE_CACHE_SIZE', '128'))
+    VALIDATION_STATE_MAX_AGE = float(os.getenv('VALIDATION_STATE_MAX_AGE', '300'))
+
+    # Hint tables are rebuilt in the background at most this often per changed story
+    HINT_REBUILD_INTERVAL = float(os.getenv('HINT_REBUILD_INTERVAL', '5.0'))
+
+    # Progress writes: "sync" commits every click, "buffered" coalesces and flushes in batches
+    PROGRESS_DURABILITY = os.getenv('PROGRESS_DURABILITY', 'sync')
+    PROGRESS_FLUSH_INTERVAL = float(os.getenv('PROGRESS_FLUSH_INTERVAL', '2.0'))
+    PROGRESS_FLUSH_MAX_PENDING = int(os.getenv('PROGRESS_FLUSH_MAX_PENDING', '1000'))
+
+    # Choice history is an append-only log written in batches, partitioned by month
+    CHOICE_EVENT_FLUSH_INTERVAL = float(os.getenv('CHOICE_EVENT_FLUSH_INTERVAL', '2.0'))
+    CHOICE_EVENT_FLUSH_MAX_PENDING = int(os.getenv('CHOICE_EVENT_FLUSH_MAX_PENDING', '5000'))
+    CHOICE_EVENT_PARTITION_MONTHS_AHEAD = int(os.getenv('CHOICE_EVENT_PARTITION_MONTHS_AHEAD', '2'))
+
+    # User stats are aggregated in memory and applied as batched increments
+    STATS_FLUSH_INTERVAL = float(os.getenv('STATS_FLUSH_INTERVAL', '10.0'))
+
+    # Play time from client heartbeats: a gap longer than the idle timeout ends the session
+    PLAY_SESSION_IDLE_TIMEOUT = float(os.getenv('PLAY_SESSION_IDLE_TIMEOUT', '60'))
+    PLAY_SESSION_FLUSH_INTERVAL = float(os.getenv('PLAY_SESSION_FLUSH_INTERVAL', '30.0'))
+
+    # Live choice percentages: counters flush this often, for at most this many stories held in memory
+    CHOICE_STATS_FLUSH_INTERVAL = float(os.getenv('CHOICE_STATS_FLUSH_INTERVAL', '5.0'))
+    CHOICE_STATS_MAX_STORIES = int(os.getenv('CHOICE_STATS_MAX_STORIES', '1024'))
+
+    # Unique-player sketches: HyperLogLog precision (error ~1.04 / sqrt(2**p)), flush interval, longest window queried
+    PLAYER_SKETCH_PRECISION = int(os.getenv('PLAYER_SKETCH_PRECISION', '12'))
+    PLAYER_SKETCH_FLUSH_INTERVAL = float(os.getenv('PLAYER_SKETCH_FLUSH_INTERVAL', '30.0'))
+    PLAYER_SKETCH_MAX_DAYS = int(os.getenv('PLAYER_SKETCH_MAX_DAYS', '90'))
+
+    # Story rankings: decay half-lives, weight of a completion relative to a play, flush interval, response cache TTL
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '24'))
+    POPULAR_HALF_LIFE_DAYS = float(os.getenv('POPULAR_HALF_LIFE_DAYS', '30'))
+    POPULARITY_COMPLETION_WEIGHT = float(os.getenv('POPULARITY_COMPLETION_WEIGHT', '3'))
+    POPULARITY_FLUSH_INTERVAL = float(os.getenv('POPULARITY_FLUSH_INTERVAL', '10.0'))
+    RANKING_CACHE_TTL = float(os.getenv('RANKING_CACHE_TTL', '30'))
+
+    # Funnel analytics stream choice_events in chunks of this many rows
+    ANALYTICS_CHUNK_SIZE = int(os.getenv('ANALYTICS_CHUNK_SIZE', '100000'))
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth_routes,story_routes,stroy_nodes_routes,choices_routes,game_engine_routes
+from app.routes import auth_routes,story_routes,stroy_nodes_routes,choices_routes,game_engine_routes,admin_routes
 from app.database import Base, sync_engine
+from app.utils.flushers import start_flushers, stop_flushers
+from app.utils.password_utils import password_pool
+from app.utils.schema_upgrades import upgrade_schema
 
 
 app = FastAPI(
@@ -15,7 +18,16 @@ app = FastAPI(
 async def startup_event():
     # This will create all tables defined in your models
     Base.metadata.create_all(bind=sync_engine)
+    # create_all leaves existing tables alone; add the constraints later versions rely on
+    upgrade_schema(sync_engine)
     print("Database tables created successfully!")
+    await start_flushers()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Drain write-behind buffers before the worker exits
+    await stop_flushers()
+    password_pool.shutdown()
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +42,7 @@ app.include_router(story_routes.router)
 app.include_router(stroy_nodes_routes.router)
 app.include_router(choices_routes.router)
 app.include_router(game_engine_routes.router)
+app.include_router(admin_routes.router)
 
 
 @app.get("/")
@@ -1 +1,84 @@
- 
\ No newline at end of file
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.database import Base
+from app.models import Choice, Story, StoryNode, User
+from app.services.story_service import story_graph_cache
+
+
+def _portable_tables():
+    # Partitioned tables need PostgreSQL; the game paths under test only buffer writes to them
+    return [table for table in Base.metadata.sorted_tables if not table.kwargs.get("postgresql_partition_by")]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=_portable_tables())
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def sync_session(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def async_session_factory(db_path):
+    # No pooling: each test drives the engine from its own event loop
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture(autouse=True)
+def cold_graph_cache():
+    story_graph_cache.clear()
+    yield
+    story_graph_cache.clear()
+
+
+@pytest.fixture
+def player(sync_session):
+    user = User(username="player", email="player@example.com", password_hash="x")
+    sync_session.add(user)
+    sync_session.commit()
+    return user.user_id
+
+
+@pytest.fixture
+def story(sync_session):
+    """A published story: start --A--> middle --A--> ending, plus start --B--> ending"""
+    story = Story(title="Test story", author="author", category="mystery", is_published=True)
+    sync_session.add(story)
+    sync_session.flush()
+
+    start = StoryNode(story_id=story.story_id, node_title="Start", content="...", is_starting_node=True, node_type="start")
+    middle = StoryNode(story_id=story.story_id, node_title="Middle", content="...", node_type="story")
+    ending = StoryNode(story_id=story.story_id, node_title="End", content="...", is_ending_node=True, node_type="ending")
+    sync_session.add_all([start, middle, ending])
+    sync_session.flush()
+
+    to_middle = Choice(from_node_id=start.node_id, to_node_id=middle.node_id, choice_text="Go on", choice_letter="A")
+    to_ending = Choice(from_node_id=start.node_id, to_node_id=ending.node_id, choice_text="Give up", choice_letter="B")
+    middle_to_ending = Choice(from_node_id=middle.node_id, to_node_id=ending.node_id, choice_text="Finish", choice_letter="A")
+    sync_session.add_all([to_middle, to_ending, middle_to_ending])
+    sync_session.commit()
+
+    return {
+        "story_id": story.story_id,
+        "start": start.node_id,
+        "middle": middle.node_id,
+        "ending": ending.node_id,
+        "to_middle": to_middle.choice_id,
+        "to_ending": to_ending.choice_id,
+        "middle_to_ending": middle_to_ending.choice_id,
+    }
@@ -1 +1,65 @@
- 
\ No newline at end of file
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import User
+from app.services.auth_service import create_token_pair, rotate_refresh_token
+
+
+def _rotate(async_session_factory, token):
+    async def run():
+        async with async_session_factory() as db:
+            return await rotate_refresh_token(db, token)
+    return asyncio.run(run())
+
+
+def _login(sync_session, player):
+    return create_token_pair(sync_session.get(User, player))
+
+
+def test_refresh_rotates_once(async_session_factory, sync_session, player):
+    pair = _login(sync_session, player)
+
+    renewed = _rotate(async_session_factory, pair["refresh_token"])
+    assert renewed["refresh_token"] != pair["refresh_token"]
+
+    # The old token was copied: reusing it revokes the whole session, the new token included
+    with pytest.raises(HTTPException) as reused:
+        _rotate(async_session_factory, pair["refresh_token"])
+    assert reused.value.status_code == 401
+    with pytest.raises(HTTPException):
+        _rotate(async_session_factory, renewed["refresh_token"])
+
+
+def test_password_change_retires_refresh_tokens(async_session_factory, sync_session, player):
+    pair = _login(sync_session, player)
+
+    sync_session.get(User, player).set_password("changed")
+    sync_session.commit()
+
+    with pytest.raises(HTTPException) as rejected:
+        _rotate(async_session_factory, pair["refresh_token"])
+    assert rejected.value.status_code == 401
+
+
+def test_rehash_keeps_refresh_tokens(async_session_factory, sync_session, player):
+    pair = _login(sync_session, player)
+
+    # What a login does when BCRYPT_ROUNDS changed: same password, new hash
+    sync_session.get(User, player).password_hash = "rehashed"
+    sync_session.commit()
+
+    assert _rotate(async_session_factory, pair["refresh_token"])["refresh_token"]
+
+
+def test_deleted_user_cannot_refresh(async_session_factory, sync_session, player):
+    pair = _login(sync_session, player)
+
+    sync_session.delete(sync_session.get(User, player))
+    sync_session.commit()
+
+    with pytest.raises(HTTPException) as rejected:
+        _rotate(async_session_factory, pair["refresh_token"])
+    assert rejected.value.status_code == 401
+
@@ -1 +1,145 @@
- 
\ No newline at end of file
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from app.models import UserProgress
+from app.schemas.engine_schemas import ChoiceRequest
+from app.services.game_engine_service import AsyncGameEngine
+from app.services.progress_service import DURABILITY_BUFFERED, ProgressStore
+from app.services.story_service import story_graph_cache
+from app.utils.cache import MemoryCacheBackend
+from app.utils.query_counter import count_queries
+
+
+def _engine(db, session_factory, durability=DURABILITY_BUFFERED):
+    store = ProgressStore(session_factory, durability=durability, interval=60, max_pending=1000)
+    return AsyncGameEngine(db, progress_store=store, cache=MemoryCacheBackend(max_entries=100))
+
+
+def _run(async_session_factory, scenario):
+    async def run():
+        async with async_session_factory() as db:
+            return await scenario(_engine(db, async_session_factory))
+    return asyncio.run(run())
+
+
+def test_cold_start_is_one_query(async_session_factory, story):
+    async def scenario(engine):
+        with count_queries("start_story") as cold:
+            body = json.loads(await engine.start_story(story["story_id"]))
+        with count_queries("start_story") as warm:
+            await engine.start_story(story["story_id"])
+        return body, cold, warm
+
+    body, cold, warm = _run(async_session_factory, scenario)
+    assert body["node_id"] == story["start"]
+    assert cold.count == 1
+    assert warm.count == 0
+
+
+def test_stateless_choice_is_zero_queries(async_session_factory, story):
+    async def scenario(engine):
+        started = json.loads(await engine.start_story(story["story_id"], stateless=True))
+        request = ChoiceRequest(
+            current_node_id=story["start"],
+            choice_id=story["to_middle"],
+            state_token=started["state_token"]
+        )
+        events_before = len(engine.event_log._pending)
+        with count_queries("make_choice") as queries:
+            result = json.loads(await engine.make_choice(request))
+        return result, queries, len(engine.event_log._pending) - events_before
+
+    result, queries, buffered_events = _run(async_session_factory, scenario)
+    assert result["next_node"]["node_id"] == story["middle"]
+    assert result["state_token"]
+    assert queries.count == 0
+    # The choice still reaches the analytics, through the background-flushed buffer
+    assert buffered_events == 1
+
+
+def test_cold_anonymous_choice_is_one_query(async_session_factory, story):
+    async def scenario(engine):
+        request = ChoiceRequest(current_node_id=story["start"], choice_id=story["to_ending"])
+        with count_queries("make_choice") as queries:
+            result = json.loads(await engine.make_choice(request))
+        return result, queries
+
+    result, queries = _run(async_session_factory, scenario)
+    assert result["is_ending"] is True
+    assert result["progress_saved"] is False
+    assert queries.count == 1
+
+
+def test_current_node_reads_only_the_progress_row(async_session_factory, sync_session, story, player):
+    sync_session.add(UserProgress(user_id=player, story_id=story["story_id"], current_node_id=story["middle"]))
+    sync_session.commit()
+
+    async def scenario(engine):
+        with count_queries("get_current_node") as cold:
+            body = json.loads(await engine.get_current_node(story["story_id"], player))
+        with count_queries("get_current_node") as warm:
+            await engine.get_current_node(story["story_id"], player)
+        return body, cold, warm
+
+    body, cold, warm = _run(async_session_factory, scenario)
+    assert body["node_id"] == story["middle"]
+    assert cold.count == 2
+    assert warm.count == 1
+
+
+def test_buffered_progress_is_read_back_without_queries(async_session_factory, story, player):
+    async def scenario(engine):
+        await engine.start_story(story["story_id"], player)
+        request = ChoiceRequest(current_node_id=story["start"], choice_id=story["to_middle"])
+        with count_queries("make_choice") as choice:
+            result = json.loads(await engine.make_choice(request, player))
+        with count_queries("get_current_node") as current:
+            body = json.loads(await engine.get_current_node(story["story_id"], player))
+        return result, body, choice, current
+
+    result, body, choice, current = _run(async_session_factory, scenario)
+    assert result["progress_saved"] is True
+    assert body["node_id"] == story["middle"]
+    assert choice.count == 0
+    assert current.count == 0
+
+
+def test_start_for_deleted_user_is_unauthorized(async_session_factory, story):
+    class DeletedUserStore(ProgressStore):
+        async def save(self, db, user_id, story_id, node_id, is_completed=False):
+            raise IntegrityError("INSERT INTO user_progress ...", {}, Exception("violates foreign key constraint"))
+
+    async def run():
+        async with async_session_factory() as db:
+            engine = AsyncGameEngine(
+                db,
+                progress_store=DeletedUserStore(async_session_factory, "sync", interval=60, max_pending=1),
+                cache=MemoryCacheBackend(max_entries=100)
+            )
+            await engine.start_story(story["story_id"], user_id=999)
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(run())
+    assert rejected.value.status_code == 401
+
+
+def test_in_progress_reads_buffered_positions_in_one_query(async_session_factory, sync_session, story, player):
+    sync_session.add(UserProgress(user_id=player, story_id=story["story_id"], current_node_id=story["start"]))
+    sync_session.commit()
+
+    async def scenario(engine):
+        request = ChoiceRequest(current_node_id=story["start"], choice_id=story["to_middle"])
+        await engine.make_choice(request, player)
+        story_graph_cache.clear()
+        with count_queries("get_in_progress") as queries:
+            page = json.loads(await engine.get_in_progress(player, limit=10))
+        return page, queries
+
+    page, queries = _run(async_session_factory, scenario)
+    assert [entry["current_node"]["node_id"] for entry in page["stories"]] == [story["middle"]]
+    assert [choice["choice_id"] for choice in page["stories"][0]["current_node"]["choices"]] == [story["middle_to_ending"]]
+    assert queries.count == 2
@@ -0,0 +1,31 @@
+from app.services.hint_service import compute_story_hints
+
+# 1 -A-> 2 -A-> 4 (ending); 1 -B-> 3 -A-> 5 (ending); 3 -B-> 2; 6 leads nowhere
+NODES = [(1, True, False), (2, False, False), (3, False, False), (4, False, True), (5, False, True), (6, False, False)]
+CHOICES = [(10, 1, 2, "A"), (11, 1, 3, "B"), (12, 2, 4, "A"), (13, 3, 5, "A"), (14, 3, 2, "B"), (15, 6, 99, "A")]
+
+
+def _hints():
+    return {row["node_id"]: row for row in compute_story_hints(1, NODES, CHOICES)}
+
+
+def test_reachable_endings_and_distances():
+    hints = _hints()
+
+    assert hints[1]["endings"] == {"4": [2, 10], "5": [2, 11]}
+    assert hints[2]["endings"] == {"4": [1, 12]}
+    assert hints[3]["endings"] == {"5": [1, 13], "4": [2, 14]}
+    assert hints[4]["endings"] == {"4": [0, None]}
+    assert hints[6]["endings"] == {}
+
+
+def test_nearest_ending_and_next_choice():
+    hints = _hints()
+
+    # Equally near endings are broken by the lower ending id
+    assert (hints[1]["distance_to_ending"], hints[1]["nearest_ending_id"], hints[1]["next_choice_id"]) == (2, 4, 10)
+    assert (hints[3]["distance_to_ending"], hints[3]["nearest_ending_id"], hints[3]["next_choice_id"]) == (1, 5, 13)
+    assert (hints[5]["distance_to_ending"], hints[5]["nearest_ending_id"], hints[5]["next_choice_id"]) == (0, 5, None)
+    # A choice leading outside the story is no way to an ending
+    assert (hints[6]["distance_to_ending"], hints[6]["nearest_ending_id"], hints[6]["next_choice_id"]) == (None, None, None)
+    assert {row["story_id"] for row in hints.values()} == {1}
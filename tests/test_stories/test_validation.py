@@ -0,0 +1,113 @@
+import random
+
+from app.services.validation_service import analyze_story_structure
+from app.services.validation_state import StoryValidationState
+
+# 1 -> 2 -> 4 (ending), 1 -> 3 (dead end), 5 <-> 6 with no way out, 7 unreachable ending
+NODES = [(1, True, False), (2, False, False), (3, False, False), (4, False, True),
+         (5, False, False), (6, False, False), (7, False, True)]
+CHOICES = [(10, 1, 2, "A"), (11, 1, 3, "B"), (12, 2, 4, "A"), (13, 2, 5, "B"),
+           (14, 5, 6, "A"), (15, 6, 5, "A"), (16, 6, 99, "B"), (17, 1, 4, "B")]
+
+
+def test_valid_story_has_no_issues():
+    result = analyze_story_structure(
+        [(1, True, False), (2, False, False), (3, False, True)],
+        [(10, 1, 2, "A"), (11, 2, 3, "A"), (12, 2, 1, "B")]
+    )
+    assert result.is_valid
+    assert result.issues == []
+    assert (result.total_nodes, result.total_choices) == (3, 3)
+
+
+def test_every_issue_kind_is_reported():
+    result = analyze_story_structure(NODES, CHOICES)
+
+    assert not result.is_valid
+    assert result.unreachable_nodes == [7]
+    assert result.dead_ends == [3]
+    assert result.cannot_reach_ending == [5, 6]
+    assert result.cycles_without_exit == [[5, 6]]
+    assert result.letter_conflicts == [1]
+    assert "Choices leading outside the story: [16]" in result.issues
+    assert (result.total_nodes, result.total_choices) == (7, 8)
+
+
+def test_missing_start_and_endings():
+    result = analyze_story_structure([(1, False, False), (2, False, False)], [(10, 1, 2, "A"), (11, 2, 1, "A")])
+
+    assert result.issues[:2] == ["Story has no starting node", "Story has no ending nodes"]
+    # Without a start or an ending there is nothing to measure reachability against
+    assert result.unreachable_nodes == []
+    assert result.cannot_reach_ending == []
+    assert analyze_story_structure([], []).issues == ["Story has no nodes"]
+
+
+def test_long_chains_do_not_recurse():
+    count = 50_000
+    nodes = [(node_id, node_id == 0, node_id == count - 1) for node_id in range(count)]
+    choices = [(node_id, node_id, node_id + 1, "A") for node_id in range(count - 1)]
+    assert analyze_story_structure(nodes, choices).is_valid
+
+
+def _same_result(state: StoryValidationState):
+    nodes = sorted((node_id, start, end) for node_id, (start, end) in state.nodes.items())
+    choices = sorted((choice_id, *edge) for choice_id, edge in state.choices.items())
+    full = analyze_story_structure(nodes, choices).model_dump()
+    incremental = state.result().model_dump()
+    # Only the order in which issue messages are listed may differ
+    full["issues"].sort()
+    incremental["issues"].sort()
+    assert incremental == full
+    assert state.is_valid == full["is_valid"]
+
+
+def test_incremental_state_follows_edits():
+    state = StoryValidationState(1, NODES, CHOICES)
+    _same_result(state)
+
+    state.choice_created(18, 6, 4, "C")      # gives the trapped cycle an exit
+    _same_result(state)
+    state.choice_updated(16, 7, "B")         # the outside choice now reaches the lone ending
+    _same_result(state)
+    state.choice_deleted(17)                 # clears the letter conflict
+    _same_result(state)
+    state.node_updated(3, False, True)       # the dead end becomes an ending
+    _same_result(state)
+    assert state.is_valid
+
+    state.choice_deleted(10)                 # cuts off most of the story
+    _same_result(state)
+    state.node_created(8, True, False)       # a second start
+    _same_result(state)
+    state.node_deleted(8)
+    _same_result(state)
+
+
+def test_incremental_state_matches_full_analysis_under_random_edits():
+    rng = random.Random(7)
+    state = StoryValidationState(1, NODES, CHOICES)
+    next_id = 100
+
+    for _ in range(400):
+        node_ids = list(state.nodes)
+        action = rng.random()
+        if action < 0.15 or not node_ids:
+            state.node_created(next_id, rng.random() < 0.1, rng.random() < 0.2)
+        elif action < 0.3:
+            state.node_updated(rng.choice(node_ids), rng.random() < 0.1, rng.random() < 0.2)
+        elif action < 0.4:
+            # Nodes are only deleted once nothing links to or from them
+            linked = {edge[0] for edge in state.choices.values()} | {edge[1] for edge in state.choices.values()}
+            free = [node_id for node_id in node_ids if node_id not in linked]
+            if free:
+                state.node_deleted(rng.choice(free))
+        elif action < 0.75:
+            target = rng.choice(node_ids + [999])
+            state.choice_created(next_id, rng.choice(node_ids), target, rng.choice("ABC"))
+        elif action < 0.9 and state.choices:
+            state.choice_deleted(rng.choice(list(state.choices)))
+        elif state.choices:
+            state.choice_updated(rng.choice(list(state.choices)), rng.choice(node_ids), rng.choice("ABC"))
+        next_id += 1
+        _same_result(state)
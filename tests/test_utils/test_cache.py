@@ -0,0 +1,186 @@
+import asyncio
+import fnmatch
+from types import SimpleNamespace
+
+import anyio
+
+from app.utils import cache as cache_module
+from app.utils.cache import BlockingCache, MemoryCacheBackend, RedisCacheBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """The subset of redis.asyncio the backend uses, over a dict with millisecond expiry"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.values = {}
+        self.expires = {}
+        self.sets = {}
+
+    def _live(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= self.clock():
+            self.values.pop(key, None)
+            del self.expires[key]
+        return key in self.values or key in self.sets
+
+    async def get(self, key):
+        return self.values.get(key) if self._live(key) else None
+
+    async def set(self, key, value, px=None):
+        self.values[key] = value
+        self.expires.pop(key, None)
+        if px:
+            self.expires[key] = self.clock() + px / 1000
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(member.encode() for member in members)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+            self.sets.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in list(self.values) + list(self.sets):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, *args, **kwargs):
+        self.calls.append(self.client.set(*args, **kwargs))
+
+    def sadd(self, *args):
+        self.calls.append(self.client.sadd(*args))
+
+    async def execute(self):
+        return [await call for call in self.calls]
+
+
+def test_memory_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=clock))
+    backend = MemoryCacheBackend(max_entries=10, default_ttl=30)
+
+    async def scenario():
+        await backend.set("default", b"1")
+        await backend.set("short", b"2", ttl=5)
+        clock.now += 10
+        short, default = await backend.get("short"), await backend.get("default")
+        clock.now += 30
+        return short, default, await backend.get("default")
+
+    assert asyncio.run(scenario()) == (None, b"1", None)
+    assert len(backend) == 0
+    assert (backend.stats.hits, backend.stats.misses) == (1, 2)
+
+
+def test_memory_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+
+    async def scenario():
+        await backend.set("a", b"a")
+        await backend.set("b", b"b")
+        await backend.get("a")
+        await backend.set("c", b"c")
+        return [await backend.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [b"a", None, b"c"]
+    assert backend.stats.evictions == 1
+    assert backend.stats.as_dict()["hit_ratio"] == 0.75
+
+
+def test_memory_tag_invalidation_drops_only_tagged_entries():
+    backend = MemoryCacheBackend(max_entries=10)
+
+    async def scenario():
+        await backend.set("node:1", b"1", tags=("story:1",))
+        await backend.set("hints:1", b"2", tags=("story:1", "hints:1"))
+        await backend.set("node:2", b"3", tags=("story:2",))
+        await backend.invalidate_tags("story:1")
+        # Evicted keys leave no tag behind to invalidate twice
+        await backend.invalidate_tags("hints:1")
+        return [await backend.get(key) for key in ("node:1", "hints:1", "node:2")]
+
+    assert asyncio.run(scenario()) == [None, None, b"3"]
+    assert backend.stats.invalidations == 2
+
+
+def test_redis_ttl_tags_and_stats():
+    clock = Clock()
+    client = FakeRedis(clock)
+    backend = RedisCacheBackend(client, namespace="test", default_ttl=30)
+
+    async def scenario():
+        await backend.set("node:1", b"1", tags=("story:1",))
+        await backend.set("node:2", b"2", ttl=5, tags=("story:2",))
+        await backend.set("list", b"3", ttl=0)
+        clock.now += 10
+        expired = await backend.get("node:2")
+        await backend.invalidate_tags("story:1")
+        return expired, await backend.get("node:1"), await backend.get("list")
+
+    assert asyncio.run(scenario()) == (None, None, b"3")
+    assert client.expires.get("test:k:list") is None
+    assert "test:t:story:1" not in client.sets
+    assert backend.stats.as_dict() == {
+        "hits": 1, "misses": 2, "sets": 3, "evictions": 0, "invalidations": 1, "hit_ratio": 1 / 3
+    }
+
+
+def test_redis_clear_stays_in_its_namespace():
+    client = FakeRedis(Clock())
+    ours = RedisCacheBackend(client, namespace="ours")
+    theirs = RedisCacheBackend(client, namespace="theirs")
+
+    async def scenario():
+        await ours.set("key", b"1", tags=("tag",))
+        await theirs.set("key", b"2")
+        await ours.clear()
+        return await ours.get("key"), await theirs.get("key")
+
+    assert asyncio.run(scenario()) == (None, b"2")
+    assert "ours:t:tag" not in client.sets
+
+
+def test_blocking_cache_from_a_worker_thread():
+    backend = MemoryCacheBackend(max_entries=10)
+
+    def sync_route():
+        blocking = BlockingCache(backend)
+        blocking.set("stories", b"[]", tags=["stories"])
+        cached = blocking.get("stories")
+        blocking.invalidate_tags("stories")
+        return cached, blocking.get("stories")
+
+    async def scenario():
+        return await anyio.to_thread.run_sync(sync_route)
+
+    assert asyncio.run(scenario()) == (b"[]", None)
+    assert (backend.stats.hits, backend.stats.misses, backend.stats.invalidations) == (1, 1, 1)
@@ -0,0 +1,47 @@
+import pytest
+
+from app.utils.hyperloglog import HyperLogLog
+
+
+def _sketch(values, precision=12):
+    sketch = HyperLogLog(precision)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize("precision,count", [(10, 20_000), (12, 1_000), (12, 50_000), (14, 100_000)])
+def test_estimate_is_within_the_stated_error(precision, count):
+    sketch = _sketch(range(count), precision)
+    # Hashing is deterministic, so three standard errors is a fixed, non-flaky bound
+    assert abs(sketch.count() - count) <= 3 * sketch.relative_error * count
+
+
+def test_small_counts_are_near_exact():
+    assert HyperLogLog().count() == 0
+    assert _sketch(["a", "b", "c", "a"]).count() == 3
+
+
+def test_union_matches_a_sketch_of_all_items():
+    left, right = _sketch(range(0, 30_000)), _sketch(range(20_000, 50_000))
+    merged = HyperLogLog.union([left, right])
+
+    assert merged.registers == _sketch(range(50_000)).registers
+    assert left.count() == _sketch(range(0, 30_000)).count()
+
+
+def test_round_trips_through_bytes():
+    sketch = _sketch(range(5_000), precision=10)
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+
+    assert (restored.precision, restored.registers) == (10, sketch.registers)
+    assert len(HyperLogLog().to_bytes()) < 64
+
+
+def test_rejects_mismatched_or_corrupt_sketches():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).update(HyperLogLog(10))
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(bytes([12]) + HyperLogLog(10).to_bytes()[1:])
+    with pytest.raises(ValueError):
+        HyperLogLog(3)